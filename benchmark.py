@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import math
+import platform
+import resource
+import subprocess
+import time
+from datetime import datetime
+from src.printing.emulator import DEFAULT_LINK, PrinterEmulator, LINE_TIME, CUT_TIME
+from src.printing.label_geometry import LABEL, LABEL_GEOMETRY
+from src.printing.label_printer import prepare_image, rasterize, compose_instructions
+from src.printing.label_template import DEFAULT_LAYOUTS, LabelTemplate
+from src.printing.label_values import receipt_values
+from src.printing.print_worker import PrintJob, PrintWorker
+from src.printing.printer_pool import PrinterPool
+
+STAGES = ['render', 'raster', 'transport', 'total']
+# How long the printers get to report their first status
+READY_TIMEOUT = 10
+
+
+def percentile(samples, pct):
+    # Nearest-rank percentile
+    ordered = sorted(samples)
+    index = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        'n': len(samples),
+        'mean_ms': sum(samples) / len(samples) * 1000,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+    }
+
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def batch_number(i):
+    return str(1000000 + i)
+
+
+def wait_ready(printers, timeout=READY_TIMEOUT):
+    # The lanes start their status monitors on their own threads, so the
+    # first timed job could otherwise race the session start
+    deadline = time.monotonic() + timeout
+    while not all(lane.ready for lane in printers.lanes):
+        if time.monotonic() >= deadline:
+            states = ', '.join(f"{lane.identifier}: {lane.session.monitor.state}" for lane in printers.lanes)
+            raise SystemExit(f"Printers not ready after {timeout} s ({states})")
+        time.sleep(0.01)
+
+
+def run_sequential(session, template, iterations, copies, drying_hours):
+    # Runs every stage of the print path on this thread, one job at a time
+    timings = {stage: [] for stage in STAGES}
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        image = template.render(receipt_values(batch_number(i), datetime.now(), drying_hours))
+        t1 = time.perf_counter()
+        # prepare_image() does nothing for a template's image, it is only
+        # here to run the same code as the app
+        data, rows = rasterize(prepare_image(image))
+        instructions = compose_instructions(data, rows, copies)
+        t2 = time.perf_counter()
+        session.print_instructions(instructions, num_pages=copies)
+        t3 = time.perf_counter()
+
+        timings['render'].append(t1 - t0)
+        timings['raster'].append(t2 - t1)
+        timings['transport'].append(t3 - t2)
+        timings['total'].append(t3 - t0)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'iterations': iterations,
+        'copies': copies,
+        'stages': {stage: summarize(samples) for stage, samples in timings.items()},
+        'labels_per_minute': iterations * copies / elapsed * 60,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def run_burst(printers, template, jobs, drying_hours):
+    # Scans arriving faster than the printers: every job is queued at once
+    # and latency is measured from submit to completion
+    worker = PrintWorker(printers=printers)
+    worker.start()
+    latencies = []
+    errors = []
+
+    start = time.perf_counter()
+    for i in range(jobs):
+        values = receipt_values(batch_number(i), datetime.now(), drying_hours)
+        submitted = time.perf_counter()
+        worker.submit(PrintJob(
+            name=f"Burst {i}",
+            render=lambda values=values: template.render(values),
+            on_done=lambda submitted=submitted: latencies.append(time.perf_counter() - submitted),
+            on_error=errors.append
+        ))
+    while worker.pending:
+        worker.dispatch_results()
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - start
+    worker.stop()
+
+    return {
+        'jobs': jobs,
+        'errors': [str(e) for e in errors],
+        'stages': {'total': summarize(latencies)} if latencies else {},
+        'labels_per_minute': len(latencies) / elapsed * 60,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results):
+    for name, workload in results['workloads'].items():
+        print(f"\n{name}: {workload['labels_per_minute']:.1f} labels/min, "
+              f"peak RSS {workload['peak_rss_kb'] / 1024:.1f} MB")
+        for stage, summary in workload['stages'].items():
+            print(f"  {stage:<10} p50 {summary['p50_ms']:8.2f} ms  "
+                  f"p95 {summary['p95_ms']:8.2f} ms  p99 {summary['p99_ms']:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Print pipeline benchmark')
+    parser.add_argument('--iterations', type=int, default=50, help='Jobs per sequential workload')
+    parser.add_argument('--copies', type=int, default=2, help='Copies in the multi-copy workload')
+    parser.add_argument('--burst', type=int, default=20, help='Jobs queued at once in the burst workload')
+    parser.add_argument('--line-time', type=float, default=LINE_TIME, help='Emulated print time per dot row')
+    parser.add_argument('--cut-time', type=float, default=CUT_TIME, help='Emulated cut time per page')
+    parser.add_argument('--printers', type=int, default=1, help='Emulated printers in the burst workload')
+    parser.add_argument('--drying-time', type=int, default=21)
+    parser.add_argument('--output', default='bench_results.json', help='Where to write the JSON results')
+    args = parser.parse_args()
+
+    emulators = []
+    for i in range(args.printers):
+        emulator = PrinterEmulator(
+            link_path=f"{DEFAULT_LINK}-bench-{i + 1}",
+            line_time=args.line_time,
+            cut_time=args.cut_time
+        )
+        emulator.start()
+        emulators.append(emulator)
+    printers = PrinterPool([emulator.device_path for emulator in emulators])
+    printers.start()
+    wait_ready(printers)
+    # The sequential workloads drive the first printer directly
+    session = printers.lanes[0].session
+
+    template = LabelTemplate(DEFAULT_LAYOUTS['receipt'], LABEL_GEOMETRY[LABEL])
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'settings': vars(args),
+        'workloads': {
+            'single_copy': run_sequential(session, template, args.iterations, 1, args.drying_time),
+            'multi_copy': run_sequential(session, template, args.iterations, args.copies, args.drying_time),
+            'burst_scan': run_burst(printers, template, args.burst, args.drying_time),
+        },
+    }
+
+    printers.stop()
+    for emulator in emulators:
+        emulator.stop()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print_report(results)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
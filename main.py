@@ -1,16 +1,179 @@
 #!/usr/bin/env python3
+import time
+
+# Taken before anything else is imported, for the time-to-interactive log
+STARTED_AT = time.monotonic()
+
 import argparse
+import sys
 from src.app import App
 
 def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Label Printer')
     parser.add_argument('--test', action='store_true', help='Run in test mode')
+    parser.add_argument('--preview', action='store_true', help='Save label previews to disk in test mode')
+    parser.add_argument('--printer', action='append', dest='printers', metavar='DEVICE',
+                        help='Print to this device only, can be given more than once (default: every /dev/usb/lp*)')
+    parser.add_argument('--emulate', action='store_true', help='Print to an emulated QL-800 instead of /dev/usb/lp*')
+    parser.add_argument('--emulate-printers', type=int, default=1, help='Number of emulated printers')
+    parser.add_argument('--emulate-line-time', type=float, default=None, help='Emulated print time per dot row in seconds')
+    parser.add_argument('--emulate-error', choices=['media_end', 'cutter_jam', 'cover_open', 'disconnect'],
+                        help='Error the emulated printer reports once --emulate-error-after pages have printed')
+    parser.add_argument('--emulate-error-after', type=int, default=1,
+                        help='Pages to print before the emulated error, on the first emulated printer')
+    parser.add_argument('--emulate-recover-after', type=float, default=None, metavar='SECONDS',
+                        help='Clear the emulated error, or reconnect after a disconnect, this many seconds later')
+    parser.add_argument('--serve', action='store_true', help='Accept print jobs over HTTP from other stations')
+    parser.add_argument('--serve-host', default='0.0.0.0', help='Address the print server listens on')
+    parser.add_argument('--serve-port', type=int, default=8631, help='Port the print server listens on')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve Prometheus metrics on this port')
+    parser.add_argument('--batch-list', metavar='FILE',
+                        help='Print a label for every batch in a CSV or text file, then exit')
+    parser.add_argument('--scanner', metavar='DEVICE',
+                        help='Read a barcode scanner directly, /dev/input/event* (needs evdev) or a serial port')
+    parser.add_argument('--soak', type=int, nargs='?', const=0, metavar='PRINTS',
+                        help='Drive simulated prints and key presses through the screens and check memory stays flat, '
+                             'a month of shifts by default')
+    parser.add_argument('--profile-jobs', type=int, metavar='N',
+                        help='Write a cProfile report for the first N print jobs to profiles/')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='Trace memory from the start, kill -USR2 writes a snapshot to profiles/')
+    parser.add_argument('--profile-imports', action='store_true',
+                        help='Write the import time breakdown to profiles/')
+    parser.add_argument('--headless', action='store_true', help='Run only the print server, without the window')
     args = parser.parse_args()
+    if args.soak is not None and not (args.test or args.emulate):
+        # Thousands of labels, never on a real printer
+        parser.error('--soak needs --test or --emulate')
+    
+    # kill -USR1 profiles the next print jobs, kill -USR2 snapshots memory
+    from src.profiling import profiler
+    profiler.install_signals()
+    if args.profile_jobs:
+        profiler.profile_jobs(args.profile_jobs)
+    if args.profile_memory:
+        # Started right away, not on the profiler thread
+        profiler.write_memory_snapshot()
+    if args.profile_imports:
+        profiler.import_times()
+    
+    # Run the full production path against emulated printers
+    printer_identifiers = args.printers
+    if args.emulate:
+        from src.printing.emulator import DEFAULT_LINK, PrinterEmulator, LINE_TIME
+        printer_identifiers = []
+        for i in range(args.emulate_printers):
+            emulator = PrinterEmulator(
+                link_path=DEFAULT_LINK if i == 0 else f"{DEFAULT_LINK}-{i + 1}",
+                line_time=LINE_TIME if args.emulate_line_time is None else args.emulate_line_time,
+                fail_after=args.emulate_error_after if args.emulate_error and i == 0 else None,
+                fail_with=args.emulate_error,
+                recover_after=args.emulate_recover_after
+            )
+            emulator.start()
+            printer_identifiers.append(emulator.device_path)
+            print(f"Emulated printer at {emulator.device_path}")
+    
+    if args.metrics_port is not None:
+        from src.printing.metrics import metrics
+        metrics.serve(args.serve_host, args.metrics_port)
+    
+    if args.batch_list:
+        print_batch_list(args, printer_identifiers)
+        return
+    
+    if args.headless:
+        serve_headless(args, printer_identifiers)
+        return
+    
+    # A soak test journals and spools thousands of made-up batches, away
+    # from the station's own journal and spool
+    data_dir = None
+    if args.soak is not None:
+        import tempfile
+        data_dir = tempfile.mkdtemp(prefix='label-soak-')
+        print(f"Soak test journal and spool in {data_dir}")
     
     # Create and run app
-    app = App(test_mode=args.test)
+    app = App(
+        test_mode=args.test,
+        save_preview=args.preview,
+        printer_identifiers=printer_identifiers,
+        started_at=STARTED_AT,
+        serve_address=(args.serve_host, args.serve_port) if args.serve else None,
+        scanner_device=args.scanner,
+        data_dir=data_dir
+    )
+    soak = None
+    if args.soak is not None:
+        from src.soak import SOAK_PRINTS, SoakTest
+        app.withdraw()
+        soak = SoakTest(app, prints=args.soak or SOAK_PRINTS)
+        soak.start()
     app.mainloop()
+    app.shutdown()
+    if soak is not None and not soak.passed:
+        sys.exit(1)
+
+def serve_headless(args, printer_identifiers):
+    from src.config_manager import ConfigManager
+    from src.printing.print_server import PrintServer
+    from src.printing.print_service import PrintService
+    
+    config_manager = ConfigManager()
+    service = PrintService(
+        config_manager,
+        test_mode=args.test,
+        save_preview=args.preview,
+        printer_identifiers=printer_identifiers
+    )
+    service.start()
+    
+    # The server's loop runs on this thread until Ctrl-C
+    server = PrintServer(service, args.serve_host, args.serve_port, dispatch=True)
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        config_manager.flush()
+
+def print_batch_list(args, printer_identifiers):
+    from src.config_manager import ConfigManager
+    from src.printing.print_service import PrintService
+    
+    config_manager = ConfigManager()
+    service = PrintService(
+        config_manager,
+        test_mode=args.test,
+        save_preview=args.preview,
+        printer_identifiers=printer_identifiers
+    )
+    service.start()
+    bulk = service.bulk_print(args.batch_list)
+    try:
+        while not bulk.finished.wait(1):
+            printed, total = bulk.progress()
+            if total is not None:
+                print(f"Printed {printed} of {total}")
+    except KeyboardInterrupt:
+        # Ends the job after the label already on its way
+        print("Cancelling...")
+        bulk.cancel()
+        bulk.finished.wait()
+    finally:
+        service.stop()
+        config_manager.flush()
+    printed, total = bulk.progress()
+    if total is None:
+        print(f"Could not read {args.batch_list}: {bulk.error}")
+        return
+    print(f"Printed {printed} of {total}" + (f", stopped: {bulk.error}" if bulk.error else ""))
+    if bulk.skipped:
+        print(f"Skipped {len(bulk.skipped)} rows that weren't batch numbers")
 
 if __name__ == '__main__':
     main()
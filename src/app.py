@@ -1,15 +1,53 @@
+import queue
+import time
 import tkinter as tk
+from datetime import datetime
 from src.screens.printer_screen import PrinterScreen
 from src.screens.settings_screen import SettingsScreen
 from src.config_manager import ConfigManager
+from src.printing.print_service import PrintService
+from src.ui_latency import UI_LATENCY_PATH, ui_latency
+
+STARTUP_LOG = 'startup.log'
 
 class App(tk.Tk):
-    def __init__(self, test_mode=True):
+    def __init__(self, test_mode=True, save_preview=False, printer_identifiers=None,
+                 started_at=None, serve_address=None, scanner_device=None, data_dir=None):
         super().__init__()
         
+        self.started_at = time.monotonic() if started_at is None else started_at
         self.test_mode = test_mode
         self.config_manager = ConfigManager()
         
+        # Printers, journal and print worker. The printers are looked for
+        # once the window is up.
+        self.print_service = PrintService(
+            self.config_manager,
+            test_mode=test_mode,
+            save_preview=save_preview,
+            printer_identifiers=printer_identifiers,
+            data_dir=data_dir
+        )
+        self.printers = self.print_service.printers
+        self.print_worker = self.print_service.worker
+        self.printer_status_changes = None
+        self.spool_changes = None
+        
+        # Other stations can submit jobs to the same queue over the network
+        self.print_server = None
+        if serve_address is not None:
+            from src.printing.print_server import PrintServer
+            self.print_server = PrintServer(self.print_service, *serve_address)
+        
+        # A barcode scanner read on its own thread, so scans are queued for
+        # printing however busy the window is. Scans waiting for the screen
+        # to show them are passed through self.scans.
+        self.scanner = None
+        self.scans = queue.Queue()
+        if scanner_device is not None:
+            from src.barcode_scanner import BarcodeScanner
+            self.scanner = BarcodeScanner(scanner_device, self.scanned)
+        
         # Configure window
         self.title("Label Printer")
         
@@ -36,11 +74,18 @@ class App(tk.Tk):
         # Show initial screen
         self.show_printer_screen()
         
+        # Start delivering print job results and printer status to the screens
+        self.after(50, self.poll_printer)
+        
+        # Runs once the window is drawn and the event loop is idle
+        self.after_idle(self.on_interactive)
+        
     def create_screens(self):
         # Create printer screen
         self.screens['printer'] = PrinterScreen(
             self,
             self.config_manager,
+            self.print_service.labels,
             self.show_settings_screen
         )
         
@@ -51,6 +96,73 @@ class App(tk.Tk):
             self.show_printer_screen
         )
     
+    def on_interactive(self):
+        elapsed_ms = (time.monotonic() - self.started_at) * 1000
+        print(f"Time to interactive: {elapsed_ms:.0f} ms")
+        with open(STARTUP_LOG, 'a') as f:
+            f.write(f"{datetime.now().isoformat(timespec='seconds')} time_to_interactive_ms={elapsed_ms:.0f}\n")
+        
+        # Measure UI responsiveness from here on, startup is logged above
+        ui_latency.start(self, log_path=None if self.test_mode else UI_LATENCY_PATH)
+        
+        # Now load the printing stack in the background
+        self.print_service.start()
+        if self.print_server is not None:
+            self.print_server.start()
+        if self.scanner is not None:
+            self.scanner.start()
+    
+    def scanned(self, batch, scanned_at):
+        # Scanner thread. The job goes straight into the print queue, the
+        # screen catches up in poll_printer().
+        printer_screen = self.screens['printer']
+        job = self.print_service.labels.receipt(
+            batch,
+            on_done=printer_screen.print_finished,
+            on_error=printer_screen.print_failed,
+            now=scanned_at
+        )
+        self.print_service.submit(job)
+        self.scans.put((batch, scanned_at))
+    
+    @ui_latency.timed('poll printer')
+    def poll_printer(self):
+        try:
+            self.print_worker.dispatch_results()
+            
+            # Redraw the printer status only when the monitor saw a change
+            if self.printers is not None:
+                changes = self.printers.changes()
+                if changes != self.printer_status_changes:
+                    self.printer_status_changes = changes
+                    self.screens['printer'].show_printer_status(self.printers.snapshot())
+            
+            # Same for the labels kept in the print spool
+            spool = self.print_service.spool
+            if spool is not None and spool.changes != self.spool_changes:
+                self.spool_changes = spool.changes
+                self.screens['printer'].show_spool(spool.snapshot())
+            
+            # Batches the scanner thread has already queued
+            while True:
+                try:
+                    batch, scanned_at = self.scans.get_nowait()
+                except queue.Empty:
+                    break
+                self.screens['printer'].show_scan(batch, scanned_at)
+        finally:
+            # Keep polling even if a redraw or a job callback failed
+            self.after(50, self.poll_printer)
+    
+    def shutdown(self):
+        ui_latency.stop()
+        if self.scanner is not None:
+            self.scanner.stop()
+        if self.print_server is not None:
+            self.print_server.stop()
+        self.print_service.stop()
+        self.config_manager.flush()
+    
     def show_screen(self, screen_name):
         # Hide all screens
         for screen in self.screens.values():
@@ -59,8 +171,11 @@ class App(tk.Tk):
         # Show requested screen
         self.screens[screen_name].pack(expand=True, fill='both')
     
+    @ui_latency.timed('printer screen')
     def show_printer_screen(self):
         self.show_screen('printer')
     
+    @ui_latency.timed('settings screen')
     def show_settings_screen(self):
+        self.screens['settings'].refresh()
         self.show_screen('settings')
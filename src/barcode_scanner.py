@@ -0,0 +1,142 @@
+import os
+import select
+import termios
+import threading
+import time
+from datetime import datetime
+from src.printing.label_values import MAX_BATCH_LENGTH
+
+# Keys further apart than this start a new scan; a scanner types a whole
+# code within a few milliseconds
+KEY_GAP = 0.5
+POLL_TIMEOUT = 1.0
+RECONNECT_INTERVAL = 2.0
+
+
+def evdev_keymap(ecodes):
+    # Key codes a scanner types for batch numbers, unshifted and shifted
+    keys = {}
+    for c in '0123456789':
+        keys[ecodes.ecodes[f'KEY_{c}']] = (c, c)
+        keys[ecodes.ecodes[f'KEY_KP{c}']] = (c, c)
+    for c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
+        keys[ecodes.ecodes[f'KEY_{c}']] = (c.lower(), c)
+    for name, plain, shifted in (
+        ('KEY_MINUS', '-', '_'), ('KEY_KPMINUS', '-', '-'), ('KEY_SLASH', '/', '?'),
+        ('KEY_KPSLASH', '/', '/'), ('KEY_DOT', '.', '>'), ('KEY_SPACE', ' ', ' '),
+    ):
+        keys[ecodes.ecodes[name]] = (plain, shifted)
+    return keys
+
+
+class BarcodeScanner(threading.Thread):
+    # Reads a USB barcode scanner directly, so scans reach the print queue
+    # however busy the Tk loop is. Input devices, /dev/input/event* or a
+    # /dev/input/by-id link to one, are read with evdev and grabbed, so
+    # their keys no longer reach the window. Anything else is read as a
+    # serial line device (scanners in USB-COM mode).
+    # on_scan(batch, scanned_at) is called on this thread.
+    def __init__(self, device, on_scan, max_length=MAX_BATCH_LENGTH):
+        super().__init__(name='barcode-scanner', daemon=True)
+        self.device = device
+        self.on_scan = on_scan
+        self.max_length = max_length
+        self.stopped = threading.Event()
+        self.buffer = ''
+        self.last_key = 0
+        self.scans = 0
+
+    def stop(self):
+        self.stopped.set()
+
+    def is_input_device(self):
+        # /dev/input/by-id/...-event-kbd and friends are links to
+        # /dev/input/event*
+        return os.path.realpath(self.device).startswith('/dev/input/')
+
+    def run(self):
+        if self.is_input_device():
+            try:
+                import evdev
+            except ImportError:
+                print("Scanner: evdev is not installed (pip install evdev)")
+                return
+            read = lambda: self.read_evdev(evdev)
+        else:
+            read = self.read_serial
+
+        while not self.stopped.is_set():
+            try:
+                read()
+            except (OSError, termios.error) as e:
+                # Unplugged, not there yet, or not a serial port after all
+                print(f"Scanner {self.device}: {e}")
+                self.buffer = ''
+                self.stopped.wait(RECONNECT_INTERVAL)
+
+    def read_evdev(self, evdev):
+        device = evdev.InputDevice(self.device)
+        keys = evdev_keymap(evdev.ecodes)
+        enter = (evdev.ecodes.KEY_ENTER, evdev.ecodes.KEY_KPENTER)
+        shift_keys = (evdev.ecodes.KEY_LEFTSHIFT, evdev.ecodes.KEY_RIGHTSHIFT)
+        shift = False
+        try:
+            device.grab()
+            print(f"Scanner: reading {device.name} ({self.device})")
+            while not self.stopped.is_set():
+                if not select.select([device.fd], [], [], POLL_TIMEOUT)[0]:
+                    continue
+                for event in device.read():
+                    if event.type != evdev.ecodes.EV_KEY:
+                        continue
+                    if event.code in shift_keys:
+                        shift = event.value != 0
+                    elif event.value != 1:
+                        # Only key down, not release or repeat
+                        continue
+                    elif event.code in enter:
+                        self.finish()
+                    elif event.code in keys:
+                        self.add(keys[event.code][shift])
+        finally:
+            device.close()
+
+    def read_serial(self):
+        import tty
+        fd = os.open(self.device, os.O_RDONLY | os.O_NOCTTY)
+        try:
+            tty.setraw(fd)
+            termios.tcflush(fd, termios.TCIFLUSH)
+            print(f"Scanner: reading {self.device}")
+            while not self.stopped.is_set():
+                if not select.select([fd], [], [], POLL_TIMEOUT)[0]:
+                    continue
+                data = os.read(fd, 256)
+                if not data:
+                    raise OSError("Scanner disconnected")
+                for c in data.decode('ascii', 'ignore'):
+                    if c in '\r\n':
+                        self.finish()
+                    elif c.isprintable():
+                        self.add(c)
+        finally:
+            os.close(fd)
+
+    def add(self, text):
+        now = time.monotonic()
+        if now - self.last_key > KEY_GAP:
+            self.buffer = ''
+        self.buffer += text
+        self.last_key = now
+
+    def finish(self):
+        batch = self.buffer.strip()
+        self.buffer = ''
+        if not batch:
+            return
+        if len(batch) > self.max_length:
+            print(f"Scanner: ignoring {batch!r}, longer than {self.max_length} characters")
+            return
+        self.scans += 1
+        # START is when the code was scanned, not when the job was built
+        self.on_scan(batch, datetime.now())
@@ -1,43 +1,155 @@
-import yaml
+import copy
 import os
+import tempfile
+import threading
+import time
+import yaml
+
+# Every known setting with its default and smallest allowed value. Settings
+# missing from config.yml or out of range fall back to the default.
+SCHEMA = {
+    'printer': {
+        'num_copies': {'default': 2, 'min': 1},
+        'drying_time': {'default': 21, 'min': 1},
+        # Black/red tape loaded, batch numbers print in red
+        'two_color': {'default': False},
+    },
+}
+
+# Seconds to wait for more edits before writing config.yml
+SAVE_DELAY = 1.0
+# Seconds between checks of config.yml for external edits
+RELOAD_INTERVAL = 2.0
+
+
+def apply_schema(config):
+    config = copy.deepcopy(config) if isinstance(config, dict) else {}
+    for section, settings in SCHEMA.items():
+        if not isinstance(config.get(section), dict):
+            config[section] = {}
+        for key, spec in settings.items():
+            value = config[section].get(key)
+            if isinstance(spec['default'], bool):
+                if not isinstance(value, bool):
+                    config[section][key] = spec['default']
+            elif not isinstance(value, int) or isinstance(value, bool) or value < spec['min']:
+                config[section][key] = spec['default']
+    return config
+
 
 class ConfigManager:
-    def __init__(self, config_path='config.yml'):
+    def __init__(self, config_path='config.yml', save_delay=SAVE_DELAY):
         self.config_path = config_path
+        self.save_delay = save_delay
+        # Reads come from the print worker as well as the Tk thread
+        self.lock = threading.RLock()
+        self.save_timer = None
+        self.mtime = None
+        self.last_reload_check = time.monotonic()
         self.load_config()
-    
+
     def load_config(self):
-        if os.path.exists(self.config_path):
-            with open(self.config_path, 'r') as f:
-                self.config = yaml.safe_load(f)
-        else:
-            # Default config
-            self.config = {
-                'printer': {
-                    'num_copies': 2,
-                    'drying_time': 19
-                }
-            }
-            self.save_config()
-    
+        with self.lock:
+            if os.path.exists(self.config_path):
+                with open(self.config_path, 'r') as f:
+                    self.mtime = os.fstat(f.fileno()).st_mtime
+                    self.config = apply_schema(yaml.safe_load(f))
+            else:
+                # Default config
+                self.config = apply_schema({})
+                self.save_config()
+
+    def reload_if_changed(self):
+        # Cheap mtime check, at most every RELOAD_INTERVAL seconds, to pick
+        # up edits made to config.yml while the app is running
+        now = time.monotonic()
+        if now - self.last_reload_check < RELOAD_INTERVAL:
+            return
+        self.last_reload_check = now
+        try:
+            mtime = os.stat(self.config_path).st_mtime
+        except OSError:
+            return
+        with self.lock:
+            # Our own unsaved edits win over the file
+            if mtime != self.mtime and self.save_timer is None:
+                try:
+                    self.load_config()
+                except yaml.YAMLError as e:
+                    print(f"Ignoring invalid {self.config_path}: {e}")
+                    self.mtime = mtime
+
     def save_config(self):
-        with open(self.config_path, 'w') as f:
-            yaml.dump(self.config, f, default_flow_style=False)
-    
+        with self.lock:
+            data = yaml.dump(self.config, default_flow_style=False)
+
+            # Write a temp file next to config.yml and rename it into place,
+            # so a power cut leaves either the old or the new file
+            directory = os.path.dirname(os.path.abspath(self.config_path))
+            fd, temp_path = tempfile.mkstemp(prefix='.config-', suffix='.yml', dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self.config_path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+            self.mtime = os.stat(self.config_path).st_mtime
+
+    def schedule_save(self):
+        # Rapid edits (+/- taps) are coalesced into one background write
+        with self.lock:
+            if self.save_timer is not None:
+                self.save_timer.cancel()
+            self.save_timer = threading.Timer(self.save_delay, self.flush)
+            self.save_timer.start()
+
+    def flush(self):
+        # Writes pending edits now. The timer thread isn't a daemon, so
+        # edits still pending when the app quits are written on exit.
+        with self.lock:
+            if self.save_timer is None:
+                return
+            self.save_timer.cancel()
+            self.save_timer = None
+            self.save_config()
+
+    def get_default(self, section, key):
+        return SCHEMA[section][key]['default']
+
     def get_num_copies(self):
+        self.reload_if_changed()
         return self.config['printer']['num_copies']
-    
+
     def get_drying_time(self):
+        self.reload_if_changed()
         return self.config['printer']['drying_time']
-    
+
+    def get_two_color(self):
+        self.reload_if_changed()
+        return self.config['printer']['two_color']
+
+    def get_label_layout(self, name):
+        # None when config.yml doesn't override the built-in layout
+        return (self.config.get('labels') or {}).get(name)
+
     def set_num_copies(self, value):
         if value < 1:
             raise ValueError("Number of copies must be at least 1")
-        self.config['printer']['num_copies'] = value
-        self.save_config()
-    
+        with self.lock:
+            self.config['printer']['num_copies'] = value
+            self.schedule_save()
+
     def set_drying_time(self, value):
         if value < 1:
             raise ValueError("Drying time must be at least 1 hour")
-        self.config['printer']['drying_time'] = value
-        self.save_config()
+        with self.lock:
+            self.config['printer']['drying_time'] = value
+            self.schedule_save()
+
+    def set_two_color(self, value):
+        with self.lock:
+            self.config['printer']['two_color'] = bool(value)
+            self.schedule_save()
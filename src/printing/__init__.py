@@ -0,0 +1 @@
+# This file makes the printing directory a Python package
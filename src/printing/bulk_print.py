@@ -0,0 +1,179 @@
+import csv
+import glob
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from src.printing.label_values import MAX_BATCH_LENGTH, receipt_values
+from src.printing.metrics import metrics
+
+# Where Raspberry Pi OS mounts USB sticks
+USB_MOUNTS = ('/media/*/*', '/media/*', '/mnt/*')
+LIST_PATTERNS = ('*.csv', '*.txt')
+# Column separators seen in batch lists, never part of a batch number
+DELIMITERS = ',;\t'
+
+
+def find_batch_lists(mounts=USB_MOUNTS):
+    # Batch list files in the top folder of every mounted USB stick
+    paths = set()
+    for mount in mounts:
+        for directory in glob.glob(mount):
+            if os.path.ismount(directory):
+                for pattern in LIST_PATTERNS:
+                    paths.update(glob.glob(os.path.join(directory, pattern)))
+    return sorted(paths)
+
+
+def read_rows(f):
+    try:
+        # Excel set to Norwegian writes ; between columns
+        dialect = csv.Sniffer().sniff(f.read(4096), delimiters=DELIMITERS)
+    except csv.Error:
+        # Rows the sniffer can't agree on, like single batches mixed with
+        # batch;qty rows, are split on any separator
+        f.seek(0)
+        return (re.split(f'[{DELIMITERS}]', line.rstrip('\r\n')) for line in f)
+    f.seek(0)
+    return csv.reader(f, dialect)
+
+
+def read_batches(path, skipped=None):
+    # Batch numbers from a CSV or a plain list, one per row, read lazily.
+    # The first non-empty cell of a row is the batch; rows without a digit
+    # in it, like headers, are skipped. Cells that can't be a batch number
+    # are left out and added to `skipped` as (row number, cell).
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for number, row in enumerate(read_rows(f), 1):
+            cell = next((cell.strip() for cell in row if cell.strip()), '')
+            if not any(c.isdigit() for c in cell):
+                continue
+            if len(cell) > MAX_BATCH_LENGTH or any(c in cell for c in DELIMITERS):
+                if skipped is not None:
+                    skipped.append((number, cell))
+                continue
+            yield cell
+
+
+def count_batches(path, skipped=None):
+    return sum(1 for _ in read_batches(path, skipped))
+
+
+class BulkPrint(threading.Thread):
+    # Prints a receipt for every batch in a list as one continuous job on
+    # one printer. Labels are rendered as the printer takes them, so memory
+    # stays flat however long the list is.
+    def __init__(self, service, path):
+        super().__init__(name='bulk-print', daemon=True)
+        self.service = service
+        self.path = path
+        # Rows that weren't a batch number, as (row number, cell)
+        self.skipped = []
+        # Counted by the thread, a long list on a USB stick takes a while
+        self.total = None
+        self.rendered = 0
+        # Pages the printer reported printed, updated as each page goes out
+        self.printed = 0
+        self.journaled = 0
+        self.printer = None
+        # Rendered labels waiting for the printer to report them printed
+        # before they go into the journal
+        self.unjournaled = deque()
+        self.error = None
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+
+    def cancel(self):
+        # The label already rendered still prints and ends the job
+        self.cancelled.set()
+
+    def progress(self):
+        # total is None until the list has been counted
+        return self.printed, self.total
+
+    def rasters(self):
+        labels = self.service.labels
+        journal = self.service.journal
+        drying_time = labels.config_manager.get_drying_time()
+        two_color = labels.config_manager.get_two_color()
+        for batch in read_batches(self.path):
+            if self.cancelled.is_set():
+                return
+            # START is when the label is printed, like at the numpad
+            values = receipt_values(batch, datetime.now(), drying_time)
+            data, rows = labels.build_receipt_raster(values, two_color)
+            self.rendered += 1
+            if self.printer is not None:
+                # Runs inside print_stream(), so the monitor's job is ours
+                progress = self.printer.session.monitor.job_progress()
+                if progress is not None:
+                    self.printed = progress[0]
+            self.journal_printed()
+            if journal is not None:
+                self.unjournaled.append((batch, values, data, rows))
+            yield data, rows
+
+    def journal_printed(self):
+        # Journals the labels the printer has reported printed, so REPRINT
+        # never finds one that was rendered ahead but cancelled or failed.
+        # The journal writes in the background, nothing piles up here.
+        journal = self.service.journal
+        while self.unjournaled and self.journaled < self.printed:
+            batch, values, data, rows = self.unjournaled.popleft()
+            journal.record(
+                batch=batch, started_at=values['start'], finished_at=values['finish'],
+                copies=1, data=data, rows=rows
+            )
+            self.journaled += 1
+
+    def run(self):
+        timings = {}
+        started = time.perf_counter()
+        try:
+            self.count()
+            # Cancelled while the list was being counted
+            if not self.cancelled.is_set():
+                self.print_all(timings)
+        except Exception as e:
+            self.error = e
+            print(f"Batch list stopped after {self.printed} of {'?' if self.total is None else self.total}: {e}")
+        timings['total'] = time.perf_counter() - started
+        printers = [] if self.printer is None else [{'printer': self.printer.identifier, 'copies': self.rendered}]
+        metrics.job_finished('Batch list', None, self.rendered, timings, printers, self.error)
+        self.finished.set()
+
+    def count(self):
+        skipped = []
+        self.total = count_batches(self.path, skipped)
+        for number, cell in skipped:
+            print(f"Batch list {os.path.basename(self.path)} row {number}: skipping {cell!r}, not a batch number")
+        self.skipped = skipped
+
+    def print_all(self, timings):
+        self.service.labels.load_templates()
+        if self.service.printers is None:
+            # Test mode, render everything and print nothing
+            for _ in self.rasters():
+                self.printed += 1
+            print(f"Test Mode: {self.printed} labels from {self.path} would be printed")
+            return
+
+        from src.printing.label_printer import stream_instructions
+        printer = self.service.printers.reserve(self.total)
+        self.printer = printer
+        last_status = printer.session.last_status
+        try:
+            status = printer.session.print_stream(stream_instructions(self.rasters()), self.total)
+            self.printed = status['pages_printed']
+        except Exception:
+            if printer.session.last_status is not last_status:
+                self.printed = printer.session.last_status['pages_printed']
+            raise
+        finally:
+            self.service.printers.release(printer, self.total)
+            # Labels rendered ahead of a cancel or an error never came out
+            self.journal_printed()
+            self.unjournaled.clear()
+        timings.update(status['timings'])
@@ -0,0 +1,234 @@
+import os
+import pty
+import select
+import tempfile
+import threading
+import time
+import tty
+from brother_ql.reader import OPCODES
+
+DEFAULT_LINK = os.path.join(tempfile.gettempdir(), 'ql800-emulator')
+
+# Seconds. A QL-800 feeds roughly 150mm/s, about 0.6ms per 300dpi dot row
+LINE_TIME = 0.0006
+CUT_TIME = 0.25
+
+# Status types and phases as sent by the printer
+STATUS_REPLY = 0x00
+STATUS_PRINTING_COMPLETED = 0x01
+STATUS_ERROR_OCCURRED = 0x02
+STATUS_PHASE_CHANGE = 0x06
+PHASE_WAITING = 0x00
+PHASE_PRINTING = 0x01
+
+# Error kinds that can be injected, as (error information 1, 2) bits
+ERRORS = {
+    'media_end': (0x01, 0x00),   # No media when printing
+    'cutter_jam': (0x04, 0x00),  # Tape cutter jam
+    'cover_open': (0x00, 0x10),  # Cover opened while printing
+}
+
+
+def next_instruction(buffer):
+    # Splits one instruction off the front of the stream the way
+    # brother_ql.reader.chunker() does, but waits for partial ones
+    for opcode, (name, length, _) in OPCODES.items():
+        if not buffer.startswith(opcode):
+            continue
+        size = len(opcode) + max(length, 0)
+        if 'raster' in name:
+            if len(buffer) < 3:
+                return None
+            size = 3 + buffer[2]
+        if len(buffer) < size:
+            return None
+        return name, buffer[:size]
+    if any(opcode.startswith(buffer) for opcode in OPCODES):
+        return None
+    return 'unknown', buffer[:1]
+
+
+class PrinterEmulator(threading.Thread):
+    def __init__(self, link_path=DEFAULT_LINK, line_time=LINE_TIME, cut_time=CUT_TIME,
+                 media_width=62, fail_after=None, fail_with='media_end', recover_after=None):
+        super().__init__(name='printer-emulator', daemon=True)
+        # The emulated device is a pty, reachable through a stable symlink
+        # so a reconnect looks like the same /dev/usb/lp0 coming back
+        self.link_path = link_path
+        self.line_time = line_time
+        self.cut_time = cut_time
+        self.media_width = media_width
+        # Inject `fail_with` once this many pages have been printed
+        self.fail_after = fail_after
+        self.fail_with = fail_with
+        # Seconds after an injected error until it clears by itself, like
+        # the operator loading labels or plugging the cable back in
+        self.recover_after = recover_after
+
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.master = None
+        self.slave = None
+        self.buffer = b''
+        self.error_bits = (0, 0)
+
+        # Job state
+        self.in_job = False
+        self.discarding = False
+        self.page_rows = 0
+
+        # Counters for tests and benchmarks
+        self.bytes_received = 0
+        self.pages_printed = 0
+        self.jobs_printed = 0
+        self.rows_printed = 0
+
+    @property
+    def device_path(self):
+        return self.link_path
+
+    def start(self):
+        self.connect()
+        super().start()
+
+    def stop(self):
+        self.stopped.set()
+        self.disconnect()
+
+    def connect(self):
+        with self.lock:
+            master, slave = pty.openpty()
+            # Raw mode on both ends, no echo and no newline translation
+            tty.setraw(master)
+            tty.setraw(slave)
+            self.master, self.slave = master, slave
+            self.buffer = b''
+            self.in_job = False
+            self.discarding = False
+            if os.path.lexists(self.link_path):
+                os.remove(self.link_path)
+            os.symlink(os.ttyname(slave), self.link_path)
+
+    def disconnect(self):
+        # Like pulling the USB cable: the handle errors and the path goes away
+        with self.lock:
+            if os.path.lexists(self.link_path):
+                os.remove(self.link_path)
+            for fd in (self.master, self.slave):
+                if fd is not None:
+                    os.close(fd)
+            self.master = self.slave = None
+
+    def inject_error(self, kind):
+        if self.recover_after is not None:
+            timer = threading.Timer(self.recover_after, self.recover)
+            timer.daemon = True
+            timer.start()
+        if kind == 'disconnect':
+            self.disconnect()
+            return
+        self.error_bits = ERRORS[kind]
+
+    def clear_errors(self):
+        self.error_bits = (0, 0)
+
+    def recover(self):
+        if self.stopped.is_set():
+            return
+        if self.master is None:
+            self.connect()
+        self.clear_errors()
+        print(f"Emulated printer {self.link_path} recovered")
+
+    def run(self):
+        while not self.stopped.is_set():
+            master = self.master
+            if master is None:
+                self.stopped.wait(0.1)
+                continue
+            try:
+                ready, _, _ = select.select([master], [], [], 0.2)
+                if not ready:
+                    continue
+                data = os.read(master, 65536)
+            except OSError:
+                # Disconnected underneath us
+                continue
+            self.bytes_received += len(data)
+            self.feed(data)
+
+    def feed(self, data):
+        self.buffer += data
+        while self.buffer:
+            instruction = next_instruction(self.buffer)
+            if instruction is None:
+                return
+            name, raw = instruction
+            self.buffer = self.buffer[len(raw):]
+            self.handle(name, raw)
+
+    def handle(self, name, raw):
+        if name == 'init':
+            self.discarding = False
+            self.page_rows = 0
+        elif name == 'status request':
+            self.reply(STATUS_REPLY, PHASE_PRINTING if self.in_job else PHASE_WAITING)
+        elif self.discarding:
+            return
+        elif 'raster' in name:
+            # Two-color lines come as a black and a red row
+            if not raw.startswith(b'\x77\x02'):
+                self.page_rows += 1
+        elif name == 'print':
+            self.print_page(last_page=raw == b'\x1A')
+
+    def print_page(self, last_page):
+        if any(self.error_bits):
+            # A job sent into an error is dropped until the next init
+            self.reply(STATUS_ERROR_OCCURRED, PHASE_WAITING)
+            self.discarding = True
+            self.in_job = False
+            return
+
+        if not self.in_job:
+            self.in_job = True
+            self.reply(STATUS_PHASE_CHANGE, PHASE_PRINTING)
+
+        time.sleep(self.page_rows * self.line_time + self.cut_time)
+        if self.fail_after is not None and self.pages_printed >= self.fail_after:
+            self.fail_after = None
+            self.inject_error(self.fail_with)
+            if self.fail_with == 'disconnect':
+                return
+            self.reply(STATUS_ERROR_OCCURRED, PHASE_WAITING)
+            self.discarding = True
+            self.in_job = False
+            return
+
+        self.pages_printed += 1
+        self.rows_printed += self.page_rows
+        self.page_rows = 0
+        self.reply(STATUS_PRINTING_COMPLETED, PHASE_PRINTING)
+        if last_page:
+            self.in_job = False
+            self.jobs_printed += 1
+            self.reply(STATUS_PHASE_CHANGE, PHASE_WAITING)
+
+    def status_frame(self, status_type, phase_type):
+        frame = bytearray(32)
+        frame[0:8] = b'\x80\x20\x42\x34\x38\x30\x00\x00'
+        frame[8], frame[9] = self.error_bits
+        frame[10] = self.media_width
+        frame[11] = 0x0A  # Continuous length tape
+        frame[18] = status_type
+        frame[19] = phase_type
+        return bytes(frame)
+
+    def reply(self, status_type, phase_type):
+        master = self.master
+        if master is None:
+            return
+        try:
+            os.write(master, self.status_frame(status_type, phase_type))
+        except OSError:
+            pass
@@ -0,0 +1,90 @@
+import numpy as np
+
+# Raster graphics transfer without compression: 67 00 <row length>
+RASTER_COMMAND = b'\x67\x00'
+# Two-color printing sends a black and a red row for every line
+BLACK_RASTER_COMMAND = b'\x77\x01'
+RED_RASTER_COMMAND = b'\x77\x02'
+
+
+def threshold_level(threshold):
+    # Same rounding as brother_ql's convert(): dots with an inverted grey
+    # value at or above this level are printed
+    level = 100.0 - threshold
+    return min(255, max(0, int(level/100.0 * 255)))
+
+
+def device_bits(image, device_pixel_width, offset, threshold):
+    # image is 8-bit greyscale ('L') at the label's printable width.
+    # Returns one bool per printer dot, True for ink, already mirrored the
+    # way the print head expects it.
+    grey = np.asarray(image, dtype=np.uint8)
+    rows, width = grey.shape
+
+    # invert() then `0 if x < level else 255` is the same as this
+    ink = grey <= 255 - threshold_level(threshold)
+
+    bits = np.zeros((rows, device_pixel_width), dtype=bool)
+    bits[:, offset:offset + width] = ink
+    return bits[:, ::-1]
+
+
+def raster_data(bits):
+    # Packs all rows at once and prefixes each with its raster command,
+    # giving the bytes BrotherQLRaster.add_raster_data() would append
+    packed = np.packbits(bits, axis=1)
+    rows, row_len = packed.shape
+    header = np.frombuffer(RASTER_COMMAND + bytes([row_len]), dtype=np.uint8)
+    data = np.empty((rows, len(header) + row_len), dtype=np.uint8)
+    data[:, :len(header)] = header
+    data[:, len(header):] = packed
+    return data.tobytes()
+
+
+def is_two_color(data):
+    return data[:len(BLACK_RASTER_COMMAND)] == BLACK_RASTER_COMMAND
+
+
+def two_color_raster_data(black_bits, red_bits):
+    # Black and red rows interleaved, the bytes add_raster_data() gives
+    # for an image and a second_image
+    black = np.packbits(black_bits, axis=1)
+    red = np.packbits(red_bits, axis=1)
+    rows, row_len = black.shape
+    header = len(BLACK_RASTER_COMMAND) + 1
+    data = np.empty((rows, 2, header + row_len), dtype=np.uint8)
+    data[:, 0, :header] = np.frombuffer(BLACK_RASTER_COMMAND + bytes([row_len]), dtype=np.uint8)
+    data[:, 1, :header] = np.frombuffer(RED_RASTER_COMMAND + bytes([row_len]), dtype=np.uint8)
+    data[:, 0, header:] = black
+    data[:, 1, header:] = red
+    return data.tobytes()
+
+
+def luma(rgb):
+    # PIL's RGB to 'L' conversion, in integers the same way
+    rgb = rgb.astype(np.uint32)
+    return ((rgb[..., 0] * 19595 + rgb[..., 1] * 38470 + rgb[..., 2] * 7471 + 0x8000) >> 16).astype(np.uint8)
+
+
+def two_color_bits(image, device_pixel_width, offset, threshold):
+    # image is RGB at the label's printable width. Picks the same black and
+    # red dots as brother_ql's convert(red=True), with whole-array masks
+    # instead of filtered_hsv()'s Python loop over every pixel.
+    hsv = np.asarray(image.convert('HSV'), dtype=np.uint8)
+    h, s, v = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+    grey = luma(np.asarray(image, dtype=np.uint8))
+    limit = 255 - threshold_level(threshold)
+
+    # Pixels outside a filter's mask are white in convert(), then
+    # greyscaled and thresholded like everything else
+    red_mask = ((h < 40) | (h > 210)) & (s > 100) & (v > 80)
+    red = np.where(red_mask, grey, 255) <= limit
+    black = (np.where(v < 80, grey, 255) <= limit) & ~red
+
+    rows, width = grey.shape
+    layers = []
+    for ink in (black, red):
+        bits = np.zeros((rows, device_pixel_width), dtype=bool)
+        bits[:, offset:offset + width] = ink
+        layers.append(bits[:, ::-1])
+    return layers
@@ -0,0 +1,91 @@
+import math
+from PIL import Image, ImageChops, ImageDraw
+
+# Everything the dynamic fields print: dates, times and batch numbers
+ATLAS_CHARACTERS = '0123456789/-: '
+
+
+class GlyphAtlas:
+    # The glyphs of one font for a small alphabet, rendered once by
+    # FreeType and then pasted together for every print
+    def __init__(self, font, characters=ATLAS_CHARACTERS):
+        self.font = font
+        self.characters = set(characters)
+        self.advances = {c: font.getlength(c) for c in self.characters}
+        self.kerning = {
+            (a, b): font.getlength(a + b) - self.advances[a] - self.advances[b]
+            for a in self.characters for b in self.characters
+        }
+        # Glyph masks and offsets by (character, subpixel start)
+        self.glyphs = {}
+
+        # With whole-pixel advances and no kerning every glyph of a string
+        # lands on the same subpixel offset, so pasting them one by one
+        # gives exactly what FreeType draws for the whole string. Fonts
+        # that don't hint that way always use FreeType.
+        self.enabled = (
+            all(advance == int(advance) for advance in self.advances.values())
+            and not any(self.kerning.values())
+        )
+        if self.enabled:
+            for c in self.characters:
+                self.glyph(c, (0.0, 0.0))
+
+    def covers(self, text):
+        return self.enabled and set(text) <= self.characters
+
+    def getlength(self, text):
+        return sum(self.advances[c] for c in text)
+
+    def glyph(self, c, start):
+        key = (c, start)
+        if key not in self.glyphs:
+            # Drawn white on black the mask comes out unchanged. The margin
+            # keeps glyphs that reach left of or above the pen on the canvas.
+            margin = self.font.size * 2
+            size = (int(self.advances[c]) + margin * 2, margin * 2)
+            canvas = Image.new('L', size, 0)
+            ImageDraw.Draw(canvas).text(
+                (margin + start[0], margin + start[1]), c, font=self.font, fill=255
+            )
+            box = canvas.getbbox()
+            if box is None:
+                # Nothing to draw, e.g. a space
+                self.glyphs[key] = None
+            else:
+                self.glyphs[key] = (canvas.crop(box), (box[0] - margin, box[1] - margin))
+        return self.glyphs[key]
+
+    def draw(self, image, xy, text, fill='black'):
+        # Same pixels as ImageDraw.text(xy, text) for text this atlas
+        # covers. Returns the drawn box, or None if nothing was drawn.
+        x, y = xy
+        if x < 0 or y < 0:
+            # ImageDraw rounds negative positions the other way
+            return None
+        start = (math.modf(x)[0], math.modf(y)[0])
+        pen_x, pen_y = int(x), int(y)
+
+        placed = []
+        for c in text:
+            glyph = self.glyph(c, start)
+            if glyph is not None:
+                mask, (dx, dy) = glyph
+                placed.append((mask, pen_x + dx, pen_y + dy))
+            pen_x += int(self.advances[c])
+        if not placed:
+            return None
+
+        # Overlapping glyph edges combine like FreeType's: the strongest wins
+        left = min(gx for _, gx, _ in placed)
+        top = min(gy for _, _, gy in placed)
+        right = max(gx + mask.size[0] for mask, gx, _ in placed)
+        bottom = max(gy + mask.size[1] for mask, _, gy in placed)
+        text_mask = Image.new('L', (right - left, bottom - top), 0)
+        for mask, gx, gy in placed:
+            box = (gx - left, gy - top, gx - left + mask.size[0], gy - top + mask.size[1])
+            text_mask.paste(ImageChops.lighter(text_mask.crop(box), mask), box)
+
+        box = (left, top, right, bottom)
+        image.paste(fill, box, text_mask)
+        return box
@@ -0,0 +1,143 @@
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+
+JOURNAL_PATH = 'print_journal.db'
+
+# Keeps the journal bounded on the SD card
+MAX_AGE_DAYS = 60
+MAX_JOBS = 5000
+# Seconds between prune runs
+PRUNE_INTERVAL = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    batch TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT NOT NULL,
+    copies INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    raster BLOB NOT NULL,
+    printed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch, id);
+CREATE INDEX IF NOT EXISTS jobs_printed_at ON jobs (printed_at);
+"""
+
+
+class JobJournal(threading.Thread):
+    def __init__(self, path=JOURNAL_PATH, max_age_days=MAX_AGE_DAYS, max_jobs=MAX_JOBS):
+        super().__init__(name='job-journal', daemon=True)
+        self.path = path
+        self.max_age_days = max_age_days
+        self.max_jobs = max_jobs
+        self.entries = queue.Queue()
+        # Readers get their own connection per thread
+        self.local = threading.local()
+        self.last_prune = 0
+
+        # Create the schema up front so readers never race the writer
+        conn = self.connect()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def reader(self):
+        if not hasattr(self.local, 'conn'):
+            self.local.conn = self.connect()
+        return self.local.conn
+
+    def record(self, batch, started_at, finished_at, copies, data, rows):
+        # Returns immediately, the row is written by the journal thread
+        self.entries.put((
+            batch,
+            started_at,
+            finished_at,
+            copies,
+            rows,
+            # Label rasters are mostly blank rows and compress very well
+            zlib.compress(data, 1),
+            time.time(),
+        ))
+
+    def stop(self, timeout=5):
+        self.entries.put(None)
+        self.join(timeout)
+
+    def run(self):
+        conn = self.connect()
+        stopping = False
+        while not stopping:
+            entry = self.entries.get()
+            if entry is None:
+                break
+
+            # Everything that queued up meanwhile goes into the same commit
+            rows = [entry]
+            while True:
+                try:
+                    entry = self.entries.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                rows.append(entry)
+
+            try:
+                with conn:
+                    conn.executemany(
+                        'INSERT INTO jobs (batch, started_at, finished_at, copies, rows, raster, printed_at)'
+                        ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        rows
+                    )
+                if time.monotonic() - self.last_prune >= PRUNE_INTERVAL:
+                    self.prune(conn)
+            except sqlite3.Error as e:
+                print(f"Journal error: {e}")
+        conn.close()
+
+    def prune(self, conn):
+        self.last_prune = time.monotonic()
+        with conn:
+            conn.execute(
+                'DELETE FROM jobs WHERE printed_at < ?',
+                (time.time() - self.max_age_days * 86400,)
+            )
+            conn.execute(
+                'DELETE FROM jobs WHERE id <= (SELECT id FROM jobs ORDER BY id DESC LIMIT 1 OFFSET ?)',
+                (self.max_jobs,)
+            )
+
+    def find(self, batch=None):
+        # Latest job for `batch`, or the latest job at all when no batch is
+        # given. Returns None if nothing was printed.
+        if batch:
+            row = self.reader().execute(
+                'SELECT batch, started_at, finished_at, copies, rows, raster FROM jobs'
+                ' WHERE batch = ? ORDER BY id DESC LIMIT 1',
+                (batch,)
+            ).fetchone()
+        else:
+            row = self.reader().execute(
+                'SELECT batch, started_at, finished_at, copies, rows, raster FROM jobs'
+                ' ORDER BY id DESC LIMIT 1'
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'batch': row[0],
+            'started_at': row[1],
+            'finished_at': row[2],
+            'copies': row[3],
+            'rows': row[4],
+            'data': zlib.decompress(row[5]),
+        }
@@ -0,0 +1,53 @@
+from brother_ql.devicedependent import (
+    label_type_specs, right_margin_addition, ENDLESS_LABEL, DIE_CUT_LABEL, ROUND_DIE_CUT_LABEL
+)
+from brother_ql.raster import BrotherQLRaster
+
+# Printer settings
+PRINTER_MODEL = 'QL-800'
+LABEL = '62'  # 62mm endless label
+TWO_COLOR_LABEL = '62red'  # 62mm black/red endless label (DK-22251)
+
+
+class LabelGeometry:
+    # Where a label's printable dots sit on the print head, and what the
+    # printer needs to be told about the media
+    def __init__(self, label, specs, device_width, margin_addition=0):
+        self.label = label
+        # Printable dots; height is 0 for endless labels
+        self.width, self.height = specs['dots_printable']
+        self.endless = specs['kind'] == ENDLESS_LABEL
+        self.right_margin = specs['right_margin_dots'] + margin_addition
+        self.device_width = device_width
+        # First print head dot covered by the label, before mirroring
+        self.offset = device_width - self.width - self.right_margin
+        self.tape_size = specs['tape_size']
+        self.feed_margin = specs['feed_margin']
+        if specs['kind'] in (DIE_CUT_LABEL, ROUND_DIE_CUT_LABEL):
+            self.media_type = 0x0B
+            self.media_length = self.tape_size[1]
+        else:
+            self.media_type = 0x0A
+            self.media_length = 0
+
+    def fit(self, size):
+        # Scale and canvas size for a layout designed at `size`. Endless
+        # labels take the layout's aspect ratio, die-cut ones are fixed.
+        width, height = size
+        scale = self.width / width
+        if self.endless:
+            return scale, (self.width, round(height * scale))
+        return min(scale, self.height / height), (self.width, self.height)
+
+
+def build_geometry_table(model=PRINTER_MODEL):
+    device_width = BrotherQLRaster(model).get_pixel_width()
+    margin_addition = right_margin_addition.get(model, 0)
+    return {
+        label: LabelGeometry(label, specs, device_width, margin_addition)
+        for label, specs in label_type_specs.items()
+    }
+
+
+# Every label the printer model knows, computed once
+LABEL_GEOMETRY = build_geometry_table()
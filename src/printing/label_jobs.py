@@ -0,0 +1,98 @@
+from datetime import datetime
+from src.printing.label_values import receipt_values
+from src.printing.print_worker import PrintJob
+
+
+class LabelJobs:
+    # Builds the print jobs for every label the app prints, for the
+    # touchscreen and the print server alike
+    def __init__(self, config_manager):
+        self.config_manager = config_manager
+        # Label layouts, compiled once on the print worker by load_templates()
+        self.templates = None
+        # Keeps the current minute's receipt ready, see prerender_receipt()
+        self.prerenderer = None
+
+    def load_templates(self):
+        # Compile the label layouts once, prints only draw the values.
+        # Runs on the print worker, so PIL and the fonts load off the UI thread.
+        if self.templates is None:
+            from src.printing.label_geometry import LABEL, LABEL_GEOMETRY
+            from src.printing.label_template import DEFAULT_LAYOUTS, LabelTemplate
+            self.templates = {
+                name: LabelTemplate(
+                    self.config_manager.get_label_layout(name) or DEFAULT_LAYOUTS[name],
+                    LABEL_GEOMETRY[LABEL]
+                )
+                for name in DEFAULT_LAYOUTS
+            }
+        return self.templates
+
+    def load_prerenderer(self):
+        if self.prerenderer is None:
+            from src.printing.prerender import ReceiptPrerenderer
+            self.prerenderer = ReceiptPrerenderer(self.load_templates()['receipt'])
+        return self.prerenderer
+
+    def prerender_receipt(self):
+        # Runs on the idle print worker. Re-renders when the minute rolls
+        # over or the drying time changes, otherwise returns straight away.
+        values = receipt_values('', datetime.now(), self.config_manager.get_drying_time())
+        self.load_prerenderer().refresh(values)
+
+    def create_receipt_image(self, values, two_color=False):
+        if two_color:
+            return self.load_templates()['receipt'].render_preview(values)
+        return self.load_templates()['receipt'].render(values)
+
+    def create_receipt_raster(self, values, two_color=False):
+        # The prerendered receipt is black only
+        if two_color:
+            return self.build_receipt_raster(values, two_color)
+        return self.load_prerenderer().raster(values)
+
+    def build_receipt_raster(self, values, two_color=False):
+        # Safe off the print worker, nothing cached is touched
+        from src.printing.label_printer import build_raster_data, rasterize_layers
+        template = self.load_templates()['receipt']
+        if two_color:
+            return rasterize_layers(*template.render_layers(values))
+        return build_raster_data(template.render(values))
+
+    def create_easter_egg_image(self):
+        return self.load_templates()['easter_egg'].render()
+
+    def receipt(self, batch, copies=None, on_done=None, on_error=None, now=None):
+        # Capture the label contents now so START matches the request,
+        # the rendering and printing happen on the print worker. A scanned
+        # batch passes the time of the scan.
+        values = receipt_values(batch, now or datetime.now(), self.config_manager.get_drying_time())
+        two_color = self.config_manager.get_two_color()
+        return PrintJob(
+            name="Labels",
+            render=lambda: self.create_receipt_image(values, two_color),
+            raster=lambda: self.create_receipt_raster(values, two_color),
+            copies=copies or self.config_manager.get_num_copies(),
+            preview_path="temp_receipt.png",
+            record={'batch': batch, 'started_at': values['start'], 'finished_at': values['finish']},
+            on_done=on_done,
+            on_error=on_error
+        )
+
+    def reprint(self, batch, on_done=None, on_error=None):
+        # One copy of exactly what was printed before, no re-rendering
+        return PrintJob(
+            name="Reprint",
+            reprint=batch,
+            on_done=on_done,
+            on_error=on_error
+        )
+
+    def easter_egg(self, on_done=None, on_error=None):
+        return PrintJob(
+            name="Easter egg",
+            render=self.create_easter_egg_image,
+            preview_path="temp_easter_egg.png",
+            on_done=on_done,
+            on_error=on_error
+        )
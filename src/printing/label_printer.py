@@ -0,0 +1,156 @@
+from PIL import Image
+from brother_ql.raster import BrotherQLRaster
+from src.printing.fast_raster import (
+    device_bits, is_two_color, raster_data, two_color_bits, two_color_raster_data
+)
+from src.printing.label_geometry import LABEL, LABEL_GEOMETRY, PRINTER_MODEL, TWO_COLOR_LABEL
+
+THRESHOLD = 70.0
+
+
+def prepare_image(image, label=LABEL, mode='L'):
+    # Greyscale image at the label's printable size. Templates already
+    # render in 'L' at that size, so for them this does nothing.
+    geometry = LABEL_GEOMETRY[label]
+
+    im = image
+    if im.mode.endswith('A'):
+        # Place in front of white background and get rid of transparency
+        bg = Image.new("RGB", im.size, (255, 255, 255))
+        bg.paste(im, im.split()[-1])
+        im = bg
+    if im.mode != mode:
+        im = im.convert(mode)
+
+    if not geometry.endless:
+        if im.size != (geometry.width, geometry.height):
+            raise ValueError(f"Bad image dimensions: {im.size}. Expecting: {(geometry.width, geometry.height)}.")
+    elif im.size[0] != geometry.width:
+        # Only for images not drawn for this label
+        hsize = int((geometry.width / im.size[0]) * im.size[1])
+        im = im.resize((geometry.width, hsize), Image.ANTIALIAS)
+    return im
+
+
+def label_bits(im, label=LABEL):
+    # Threshold and mirror a prepared label, one bool per printer dot.
+    # The label goes straight into its place on the print head.
+    geometry = LABEL_GEOMETRY[label]
+    return device_bits(im, geometry.device_width, geometry.offset, THRESHOLD)
+
+
+def rasterize(im, label=LABEL):
+    # Threshold, mirror and pack a prepared label with NumPy
+    return raster_data(label_bits(im, label)), im.size[1]
+
+
+def build_raster_data(image, label=LABEL):
+    return rasterize(prepare_image(image, label), label)
+
+
+def rasterize_layers(black, red, label=TWO_COLOR_LABEL):
+    # Black and red drawn as separate greyscale layers, so no colour
+    # separation is needed. Red wins where both have ink.
+    red_bits = label_bits(prepare_image(red, label), label)
+    black_bits = label_bits(prepare_image(black, label), label) & ~red_bits
+    return two_color_raster_data(black_bits, red_bits), red_bits.shape[0]
+
+
+def build_two_color_raster_data(image, label=TWO_COLOR_LABEL):
+    # Any RGB image, split into black and red like convert(red=True)
+    im = prepare_image(image, label, mode='RGB')
+    geometry = LABEL_GEOMETRY[label]
+    black_bits, red_bits = two_color_bits(im, geometry.device_width, geometry.offset, THRESHOLD)
+    return two_color_raster_data(black_bits, red_bits), im.size[1]
+
+
+def add_page(qlr, data, rows, label=LABEL, first_page=True, last_page=True):
+    geometry = LABEL_GEOMETRY[label]
+
+    # The media/quality command flags every page after the first one
+    qlr.page_number = 0 if first_page else 1
+    qlr.add_status_information()
+    qlr.mtype = geometry.media_type
+    qlr.mwidth = geometry.tape_size[0]
+    qlr.mlength = geometry.media_length
+    qlr.pquality = True
+    qlr.add_media_and_quality(rows)
+
+    # Cut after every page
+    qlr.add_autocut(True)
+    qlr.add_cut_every(1)
+    qlr.dpi_600 = False
+    qlr.cut_at_end = True
+    # Two-color rasters say so themselves, reprints and spooled labels too
+    qlr.two_color_printing = is_two_color(data)
+    qlr.add_expanded_mode()
+    qlr.add_margins(geometry.feed_margin)
+
+    qlr.data += data
+    # Form feed between copies, print with feeding after the last one
+    qlr.add_print(last_page=last_page)
+
+
+def start_instructions():
+    qlr = BrotherQLRaster(PRINTER_MODEL)
+    qlr.exception_on_warning = True
+    qlr.add_switch_mode()
+    qlr.add_invalidate()
+    qlr.add_initialize()
+    qlr.add_switch_mode()
+    return qlr
+
+
+def compose_instructions(data, rows, num_copies=1, label=LABEL):
+    # Create the label instructions
+    qlr = start_instructions()
+
+    for page in range(num_copies):
+        add_page(
+            qlr,
+            data,
+            rows,
+            label=label,
+            first_page=page == 0,
+            last_page=page == num_copies - 1
+        )
+
+    return qlr.data
+
+
+def stream_instructions(rasters, label=LABEL):
+    # Instructions for one multi-page job, one page at a time, from
+    # (data, rows) pairs. Looks one page ahead to know which is the last,
+    # so when `rasters` stops early the page in hand ends the job.
+    qlr = start_instructions()
+    previous = None
+    first_page = True
+    for raster in rasters:
+        if previous is not None:
+            add_page(qlr, *previous, label=label, first_page=first_page, last_page=False)
+            yield qlr.data
+            qlr.data = b''
+            first_page = False
+        previous = raster
+    if previous is not None:
+        add_page(qlr, *previous, label=label, first_page=first_page, last_page=True)
+        yield qlr.data
+
+
+def build_instructions(image, num_copies=1, label=LABEL):
+    # Rasterize once, every copy reuses the same rows
+    data, rows = build_raster_data(image, label)
+    return compose_instructions(data, rows, num_copies, label)
+
+
+def print_raster(session, data, rows, num_copies=1):
+    # All copies go out as one multi-page job
+    instructions = compose_instructions(data, rows, num_copies)
+
+    # Send over the session's long-lived device handle
+    return session.print_instructions(instructions, num_pages=num_copies)
+
+
+def print_image(session, image, num_copies=1):
+    data, rows = build_raster_data(image)
+    return print_raster(session, data, rows, num_copies)
@@ -0,0 +1,175 @@
+from itertools import combinations
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+from src.printing.glyph_atlas import GlyphAtlas
+
+DEFAULT_FONT = "assets/Nohemi/OpenType-TT/Nohemi-Bold.ttf"
+
+# Layouts used when config.yml doesn't describe them. Fields either have
+# fixed `text` (drawn once into the background) or take a `value` filled
+# in per print. `when` only draws a field if that value is non-blank.
+# `color` red fields print red on black/red tape and black otherwise.
+# Sizes and positions are design units, scaled to the label being printed.
+DEFAULT_LAYOUTS = {
+    'receipt': {
+        'size': [800, 365],  # ~32mm high on 62mm tape
+        'fields': [
+            {'text': 'START:', 'font_size': 48, 'position': [50, 50]},
+            {'value': 'start', 'font_size': 48, 'position': [750, 50], 'align': 'right'},
+            {'text': 'FERDIG:', 'font_size': 48, 'position': [50, 160]},
+            {'value': 'finish', 'font_size': 48, 'position': [750, 160], 'align': 'right'},
+            {'text': 'BATCH:', 'font_size': 63, 'position': [50, 270], 'when': 'batch'},
+            {'value': 'batch', 'font_size': 63, 'position': [750, 270], 'align': 'right', 'color': 'red'},
+        ],
+    },
+    'easter_egg': {
+        'size': [800, 150],  # Shorter height for single line
+        'fields': [
+            {'text': 'Slutt å tull!', 'font_size': 48, 'position': [400, 51], 'align': 'center'},
+        ],
+    },
+}
+
+_fonts = {}
+_atlases = {}
+
+
+def load_font(path, size):
+    # Fonts are shared by every template and loaded only once
+    key = (path, size)
+    if key not in _fonts:
+        try:
+            _fonts[key] = ImageFont.truetype(path, size)
+        except OSError:
+            _fonts[key] = ImageFont.load_default()
+    return _fonts[key]
+
+
+def load_atlas(path, size):
+    key = (path, size)
+    if key not in _atlases:
+        _atlases[key] = GlyphAtlas(load_font(path, size))
+    return _atlases[key]
+
+
+class LabelField:
+    def __init__(self, spec, scale=1.0):
+        self.text = spec.get('text')
+        self.value = spec.get('value')
+        # Whole pixels, so glyphs line up the same way on every print
+        font_size = round(spec['font_size'] * scale)
+        self.font = load_font(spec.get('font', DEFAULT_FONT), font_size)
+        # Values are drawn from pre-rendered glyphs where possible
+        self.atlas = None
+        if self.value is not None and isinstance(self.font, ImageFont.FreeTypeFont):
+            self.atlas = load_atlas(spec.get('font', DEFAULT_FONT), font_size)
+        self.position = tuple(round(v * scale) for v in spec['position'])
+        self.align = spec.get('align', 'left')
+        self.when = spec.get('when', self.value)
+        self.color = spec.get('color', 'black')
+
+    def getlength(self, text):
+        if self.atlas is not None and self.atlas.covers(text):
+            return self.atlas.getlength(text)
+        return self.font.getlength(text)
+
+    def origin(self, text):
+        x, y = self.position
+        if self.align == 'right':
+            x -= self.getlength(text)
+        elif self.align == 'center':
+            x -= self.getlength(text) / 2
+        return x, y
+
+    def draw(self, image, text):
+        # Returns the box drawn into, None if nothing was drawn
+        origin = self.origin(text)
+        if self.atlas is not None and self.atlas.covers(text):
+            box = self.atlas.draw(image, origin, text)
+            if box is not None or not text.strip():
+                return box
+
+        # Anything else goes through FreeType
+        draw = ImageDraw.Draw(image)
+        draw.text(origin, text, font=self.font, fill='black')
+        return draw.textbbox(origin, text, font=self.font)
+
+
+class LabelTemplate:
+    def __init__(self, layout, geometry=None):
+        # Drawn straight at the label's printable dots when its geometry is
+        # given, so nothing needs resizing before printing
+        if geometry is None:
+            scale, self.size = 1.0, tuple(layout['size'])
+        else:
+            scale, self.size = geometry.fit(layout['size'])
+        fields = [LabelField(spec, scale) for spec in layout['fields']]
+        self.static_fields = [f for f in fields if f.text is not None]
+        self.dynamic_fields = [f for f in fields if f.text is None]
+
+        # Pre-render the static layer for every combination of conditions.
+        # The layers of two-color labels are rendered when first needed.
+        conditions = sorted({f.when for f in self.static_fields if f.when})
+        self.backgrounds = {}
+        for count in range(len(conditions) + 1):
+            for present in combinations(conditions, count):
+                self.backgrounds[frozenset(present), None] = self.render_background(present)
+
+    def render_background(self, present, color=None):
+        # 8-bit greyscale is all the printer needs and skips an RGB pass
+        image = Image.new('L', self.size, 'white')
+        for field in self.static_fields:
+            if color is not None and field.color != color:
+                continue
+            if field.when is None or field.when in present:
+                field.draw(image, field.text)
+        return image
+
+    def render(self, values=None, present=None, color=None):
+        # `present` overrides which conditional fields are drawn, by default
+        # the ones whose value is filled in. With `color` only that color's
+        # fields are drawn, as one layer of a two-color label.
+        values = values or {}
+        if present is None:
+            present = {name for name, value in values.items() if str(value).strip()}
+        present = set(present)
+
+        # Only the dynamic values are drawn, onto a copy of the static layer
+        conditions = frozenset(present & {f.when for f in self.static_fields if f.when})
+        if (conditions, color) not in self.backgrounds:
+            self.backgrounds[conditions, color] = self.render_background(conditions, color)
+        image = self.backgrounds[conditions, color].copy()
+        for field in self.dynamic_fields:
+            if color is not None and field.color != color:
+                continue
+            if field.when is None or field.when in present:
+                field.draw(image, str(values.get(field.value, '')))
+        return image
+
+    def render_layers(self, values=None, present=None):
+        # (black, red) layers for black/red tape
+        return self.render(values, present, 'black'), self.render(values, present, 'red')
+
+    def render_preview(self, values=None, present=None):
+        # How a two-color label will look, for previews
+        black, red = self.render_layers(values, present)
+        image = Image.new('RGB', self.size, 'white')
+        image.paste((0, 0, 0), mask=ImageOps.invert(black))
+        image.paste((255, 0, 0), mask=ImageOps.invert(red))
+        return image
+
+    def draw_value(self, image, name, value):
+        # Draws one value onto an already rendered label. Returns the
+        # source rows it touched as (top, bottom), or None if none.
+        top = bottom = None
+        text = str(value)
+        for field in self.dynamic_fields:
+            if field.value != name:
+                continue
+            box = field.draw(image, text)
+            if box is None:
+                continue
+            top = box[1] if top is None else min(top, box[1])
+            bottom = box[3] if bottom is None else max(bottom, box[3])
+        if top is None:
+            return None
+        return top, bottom
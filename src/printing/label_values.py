@@ -0,0 +1,15 @@
+from datetime import timedelta
+
+# Longest batch number, the same for the numpad, the scanner, batch lists
+# and the print server
+MAX_BATCH_LENGTH = 10
+
+
+def receipt_values(batch, now, drying_hours):
+    # Values for the receipt layout's dynamic fields
+    finish_time = now + timedelta(hours=drying_hours)
+    return {
+        'start': now.strftime("%d/%m-%Y %H:%M"),
+        'finish': finish_time.strftime("%d/%m-%Y %H:%M"),
+        'batch': batch,
+    }
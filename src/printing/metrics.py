@@ -0,0 +1,204 @@
+import json
+import threading
+import time
+from datetime import datetime
+from src.printing.print_spool import SpooledError
+from src.printing.printer_session import PrinterError
+
+# One JSON line per finished job, rotated so a shift's worth stays on disk
+METRICS_PATH = 'metrics.log'
+MAX_BYTES = 1024 * 1024
+BACKUP_COUNT = 5
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    'label_pipeline_seconds': 'Time spent in each stage before a job reaches a printer',
+    'label_printer_seconds': 'Time from sending a job until the printer reaches each stage',
+    'label_jobs_total': 'Finished print jobs by outcome',
+    'label_copies_total': 'Copies printed',
+    'label_errors_total': 'Failed jobs by error',
+    'label_printer_errors_total': 'Failed print attempts by printer and error',
+    'label_retries_total': 'Copies moved to another printer after a failure',
+    'ui_heartbeat_lateness_seconds': 'How late the Tk heartbeat fired',
+    'ui_callback_seconds': 'Time spent in each touchscreen callback',
+    'ui_stalls_total': 'Times the Tk event loop was blocked past the stall threshold',
+}
+
+
+def error_name(error):
+    if isinstance(error, SpooledError):
+        error = error.error
+    # Printer errors carry the printer's own wording, a small fixed set
+    if isinstance(error, PrinterError):
+        return str(error)
+    return type(error).__name__
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Span:
+    # Times a block as one stage of a job
+    def __init__(self, metrics, stage, timings):
+        self.metrics = metrics
+        self.stage = stage
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        self.timings[self.stage] = elapsed
+        self.metrics.observe('label_pipeline_seconds', elapsed, stage=self.stage)
+        return False
+
+
+class Metrics:
+    def __init__(self):
+        # Updated from the print worker, the printer threads and the server
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        # Per-job lines, only written once open_log() is called
+        self.log = None
+
+    def open_log(self, path=METRICS_PATH, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT):
+        if self.log is not None:
+            return
+        import logging
+        from logging.handlers import RotatingFileHandler
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        log = logging.getLogger('label_metrics')
+        log.setLevel(logging.INFO)
+        log.propagate = False
+        log.addHandler(handler)
+        self.log = log
+
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+            buckets = histogram[0]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def histogram(self, name, **labels):
+        # (bucket counts, sum, count), or None before the first observation
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                return None
+            buckets, total, count = histogram
+            return list(buckets), total, count
+
+    def span(self, stage, timings):
+        return Span(self, stage, timings)
+
+    def printed(self, printer, timings):
+        # Seconds from writing a job to the printer until each stage
+        for stage, seconds in timings.items():
+            self.observe('label_printer_seconds', seconds, printer=printer, stage=stage)
+
+    def job_finished(self, name, batch, copies, timings, printers, error=None):
+        if error is None:
+            self.count('label_jobs_total', outcome='printed')
+            self.count('label_copies_total', copies)
+        else:
+            self.count('label_jobs_total', outcome='failed')
+            self.count('label_errors_total', error=error_name(error))
+
+        if self.log is None:
+            return
+        self.log.info(json.dumps({
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'job': name,
+            'batch': batch,
+            'copies': copies,
+            'error': None if error is None else str(error),
+            'ms': {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()},
+            'printers': printers,
+        }))
+
+    def prometheus(self):
+        # Prometheus text exposition format
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, (list(buckets), total, count))
+                for key, (buckets, total, count) in self.histograms.items()
+            )
+
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name, 'counter')
+            lines.append(f"{name}{format_labels(labels)} {value}")
+
+        for (name, labels), (buckets, total, count) in histograms:
+            describe(name, 'histogram')
+            for bound, bucket in zip(BUCKETS, buckets):
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', bound),))} {bucket}")
+            lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, host, port):
+        # Plain /metrics endpoint for when the print server isn't running
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+        print(f"Metrics on http://{host}:{port}/metrics")
+        return server
+
+
+# Shared by every part of the printing stack
+metrics = Metrics()
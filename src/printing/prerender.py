@@ -0,0 +1,64 @@
+from src.printing.fast_raster import raster_data
+from src.printing.label_printer import LABEL, build_raster_data, label_bits, prepare_image
+
+
+class ReceiptPrerenderer:
+    # Keeps the receipt for the current START/FERDIG times rendered and
+    # converted, so a print only has to draw and convert the batch rows.
+    # Only used from the print worker thread.
+    def __init__(self, template, batch_field='batch', label=LABEL):
+        self.template = template
+        self.batch_field = batch_field
+        self.label = label
+        self.key = None
+        # Finished raster for a label without a batch number
+        self.blank = None
+        # Label with the BATCH: text but no value, as drawn and as dots
+        self.batch_image = None
+        self.batch_bits = None
+
+    def cache_key(self, values):
+        # Everything but the batch number, i.e. the minute and drying time
+        return tuple(sorted(
+            (name, str(value)) for name, value in values.items() if name != self.batch_field
+        ))
+
+    def refresh(self, values):
+        key = self.cache_key(values)
+        if key == self.key:
+            return
+        values = {name: value for name, value in values.items() if name != self.batch_field}
+
+        self.blank = build_raster_data(self.template.render(values), self.label)
+
+        present = {name for name, value in values.items() if str(value).strip()}
+        self.batch_image = prepare_image(
+            self.template.render(values, present=present | {self.batch_field}), self.label
+        )
+        self.batch_bits = label_bits(self.batch_image, self.label)
+        self.key = key
+
+    def raster(self, values):
+        # (data, rows) for `values`, the same bytes build_raster_data()
+        # gives for the fully rendered label
+        if self.cache_key(values) != self.key or self.batch_image.size != self.template.size:
+            # Minute or drying time moved on since the last refresh, or the
+            # template isn't drawn at the label's resolution
+            return build_raster_data(self.template.render(values), self.label)
+
+        batch = str(values.get(self.batch_field, ''))
+        if not batch.strip():
+            return self.blank
+
+        image = self.batch_image.copy()
+        touched = self.template.draw_value(image, self.batch_field, batch)
+        if touched is None:
+            return self.blank
+
+        # Rows are converted independently at native resolution, so only
+        # the ones the batch number touched are redone
+        top = max(0, touched[0])
+        bottom = min(image.size[1], touched[1])
+        bits = self.batch_bits.copy()
+        bits[top:bottom] = label_bits(image.crop((0, top, image.size[0], bottom)), self.label)
+        return raster_data(bits), bits.shape[0]
@@ -0,0 +1,290 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+from src.printing.label_values import MAX_BATCH_LENGTH
+from src.printing.metrics import metrics
+
+DEFAULT_PORT = 8631
+
+# Network jobs allowed to wait for the printer at once, in total and per
+# station. Keeps one busy station from holding up the touchscreen.
+MAX_QUEUED = 20
+MAX_QUEUED_PER_CLIENT = 5
+# Seconds a client is told to wait before retrying a full queue
+RETRY_AFTER = 5
+
+MAX_COPIES = 10
+
+# Finished jobs kept for GET /jobs
+HISTORY = 100
+MAX_REQUEST_SIZE = 64 * 1024
+# Seconds a client gets to send its request
+REQUEST_TIMEOUT = 10
+# Longest a client may wait for a job to finish
+MAX_WAIT = 300
+
+# How often the headless server delivers finished jobs, like App.poll_printer
+DISPATCH_INTERVAL = 0.05
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ServerJob:
+    def __init__(self, job_id, batch, copies, client):
+        self.id = job_id
+        self.batch = batch
+        self.copies = copies
+        self.client = client
+        self.state = 'queued'
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        # Set on the server's loop once the printer is done with the job
+        self.finished = asyncio.Event()
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'batch': self.batch,
+            'copies': self.copies,
+            'state': self.state,
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class PrintServer(threading.Thread):
+    # Small HTTP/JSON API so other stations can print through this Pi.
+    # Jobs go into the same print worker queue as the touchscreen.
+    #
+    #   POST /jobs        {"batch": "123", "copies": 2}, ?wait=1 to block
+    #                     until printed
+    #   GET  /jobs        queued and recently finished network jobs
+    #   GET  /jobs/<id>   one job, ?wait=<seconds> to long-poll
+    #   GET  /status      printer states and queue length
+    #   GET  /metrics     job timings and counters for Prometheus
+    def __init__(self, service, host='0.0.0.0', port=DEFAULT_PORT, dispatch=False,
+                 max_queued=MAX_QUEUED, max_queued_per_client=MAX_QUEUED_PER_CLIENT):
+        super().__init__(name='print-server', daemon=True)
+        self.service = service
+        self.host = host
+        self.port = port
+        # Without Tk nobody else calls dispatch_results(), so the server does
+        self.dispatch = dispatch
+        self.max_queued = max_queued
+        self.max_queued_per_client = max_queued_per_client
+
+        self.loop = None
+        self.stopping = None
+        self.ids = itertools.count(1)
+        # Only touched on the server's loop
+        self.active = {}
+        self.history = deque(maxlen=HISTORY)
+
+    def run(self):
+        asyncio.run(self.serve())
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stopping.set)
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        server = await asyncio.start_server(self.handle, self.host, self.port, limit=MAX_REQUEST_SIZE)
+        # Port 0 picks a free port, report the real one
+        self.port = server.sockets[0].getsockname()[1]
+        print(f"Print server listening on {self.host}:{self.port}")
+
+        async with server:
+            dispatcher = None
+            if self.dispatch:
+                dispatcher = asyncio.create_task(self.dispatch_results())
+            await self.stopping.wait()
+            if dispatcher is not None:
+                dispatcher.cancel()
+
+    async def dispatch_results(self):
+        while True:
+            self.service.worker.dispatch_results()
+            await asyncio.sleep(DISPATCH_INTERVAL)
+
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        client = peer[0] if peer else 'unknown'
+        try:
+            try:
+                request = await asyncio.wait_for(self.read_request(reader), REQUEST_TIMEOUT)
+                status, payload = await self.route(client, *request)
+            except RequestError as e:
+                status, payload = e.status, {'error': str(e)}
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError,
+                    asyncio.LimitOverrunError, ValueError):
+                status, payload = 400, {'error': 'Bad request'}
+            await self.send(writer, status, payload)
+        except ConnectionError:
+            # The client went away, nothing to tell it
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        head = await reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = lines[0].split(' ', 2)
+
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', 0))
+        if length > MAX_REQUEST_SIZE:
+            raise RequestError(413, "Request too large")
+        body = await reader.readexactly(length) if length else b''
+
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        return method.upper(), url.path.rstrip('/') or '/', query, body
+
+    async def send(self, writer, status, payload):
+        # Text goes out as is, everything else as JSON
+        if isinstance(payload, str):
+            body = payload.encode('utf-8')
+            content_type = "text/plain; version=0.0.4"
+        else:
+            body = json.dumps(payload).encode('utf-8')
+            content_type = "application/json"
+        head = [
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            "Connection: close",
+        ]
+        if status in (429, 503):
+            head.append(f"Retry-After: {RETRY_AFTER}")
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def route(self, client, method, path, query, body):
+        if path == '/status':
+            self.require(method, 'GET')
+            return 200, self.status()
+        if path == '/metrics':
+            self.require(method, 'GET')
+            return 200, metrics.prometheus()
+        if path == '/jobs':
+            if method == 'POST':
+                return await self.create_job(client, query, body)
+            self.require(method, 'GET')
+            return 200, {'jobs': [job.as_dict() for job in self.jobs()]}
+        if path.startswith('/jobs/'):
+            self.require(method, 'GET')
+            return await self.get_job(path[len('/jobs/'):], query)
+        raise RequestError(404, "Not found")
+
+    def require(self, method, allowed):
+        if method != allowed:
+            raise RequestError(405, "Method not allowed")
+
+    def status(self):
+        return {
+            'printers': self.service.printer_status(),
+            # Everything waiting for the printer, touchscreen jobs included
+            'pending': self.service.worker.pending,
+            'queued': len(self.active),
+            # Labels kept after a failed print, resent once a printer is ready
+            'spool': self.service.spool_status(),
+        }
+
+    def jobs(self):
+        return list(self.active.values()) + list(self.history)
+
+    def find_job(self, job_id):
+        for job in self.jobs():
+            if str(job.id) == job_id:
+                return job
+        raise RequestError(404, "No such job")
+
+    async def create_job(self, client, query, body):
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            raise RequestError(400, "Body must be JSON")
+        if not isinstance(request, dict):
+            raise RequestError(400, "Body must be a JSON object")
+
+        batch = request.get('batch', '')
+        if not isinstance(batch, str) or len(batch) > MAX_BATCH_LENGTH:
+            raise RequestError(400, f"batch must be a string of at most {MAX_BATCH_LENGTH} characters")
+        copies = request.get('copies')
+        if copies is not None and (not isinstance(copies, int) or isinstance(copies, bool)
+                                   or not 1 <= copies <= MAX_COPIES):
+            raise RequestError(400, f"copies must be between 1 and {MAX_COPIES}")
+
+        # Backpressure: refuse instead of letting the queue grow unbounded
+        if len(self.active) >= self.max_queued:
+            raise RequestError(503, "Print queue is full")
+        if sum(job.client == client for job in self.active.values()) >= self.max_queued_per_client:
+            raise RequestError(429, "Too many jobs queued from this station")
+
+        job = ServerJob(next(self.ids), batch, copies, client)
+        print_job = self.service.labels.receipt(
+            batch,
+            copies=copies,
+            on_done=lambda: self.loop.call_soon_threadsafe(self.finish, job, None),
+            on_error=lambda e: self.loop.call_soon_threadsafe(self.finish, job, e)
+        )
+        # Falls back to the configured number of copies
+        job.copies = print_job.copies
+        self.active[job.id] = job
+        self.service.submit(print_job)
+
+        if query.get('wait', '0') in ('0', ''):
+            return 202, job.as_dict()
+        await self.wait_for(job, MAX_WAIT)
+        return self.job_response(job)
+
+    async def get_job(self, job_id, query):
+        job = self.find_job(job_id)
+        try:
+            timeout = min(float(query.get('wait', 0)), MAX_WAIT)
+        except ValueError:
+            raise RequestError(400, "wait must be a number of seconds")
+        if timeout > 0:
+            await self.wait_for(job, timeout)
+        return 200, job.as_dict()
+
+    async def wait_for(self, job, timeout):
+        try:
+            await asyncio.wait_for(job.finished.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def job_response(self, job):
+        if job.state == 'failed':
+            # The printer is this server's upstream
+            return 502, job.as_dict()
+        if job.state == 'done':
+            return 200, job.as_dict()
+        return 202, job.as_dict()
+
+    def finish(self, job, error):
+        # Runs on the server's loop, via the print worker's callbacks
+        job.state = 'done' if error is None else 'failed'
+        job.error = None if error is None else str(error)
+        job.finished_at = time.time()
+        self.active.pop(job.id, None)
+        self.history.appendleft(job)
+        job.finished.set()
@@ -0,0 +1,103 @@
+import os
+from src.printing.job_journal import JOURNAL_PATH, JobJournal
+from src.printing.label_jobs import LabelJobs
+from src.printing.metrics import METRICS_PATH, metrics
+from src.printing.print_spool import SPOOL_PATH, PrintSpool
+from src.printing.print_worker import PrintWorker
+from src.printing.printer_pool import PrinterPool
+
+
+class PrintService:
+    # Everything behind the print button: the printers, the job journal
+    # and the print worker, shared by the touchscreen and the print server
+    def __init__(self, config_manager, test_mode=False, save_preview=False,
+                 printer_identifiers=None, data_dir=None):
+        self.test_mode = test_mode
+        self.labels = LabelJobs(config_manager)
+
+        # Every connected printer, or just `printer_identifiers`. Devices
+        # are kept open between jobs. Started by start().
+        self.printers = None
+        # Every printed label is journaled so it can be reprinted by batch
+        self.journal = None
+        # Labels not printed yet survive printer errors and restarts
+        self.spool = None
+        # The batch list being printed, see bulk_print()
+        self.bulk = None
+        if not test_mode:
+            self.printers = PrinterPool(printer_identifiers)
+            # The journal, spool and metrics log go to `data_dir` when
+            # given, so test runs don't mix with the station's own
+            data_path = lambda path: path if data_dir is None else os.path.join(data_dir, path)
+            self.journal = JobJournal(data_path(JOURNAL_PATH))
+            self.journal.start()
+            self.spool = PrintSpool(data_path(SPOOL_PATH))
+            self.spool.start()
+            # Stage timings of every printed job, see metrics.py
+            metrics.open_log(data_path(METRICS_PATH))
+
+        # Printing runs on a background worker so the UI never blocks
+        self.worker = PrintWorker(
+            printers=self.printers,
+            journal=self.journal,
+            spool=self.spool,
+            test_mode=test_mode,
+            save_preview=save_preview
+        )
+        self.worker.start()
+
+    def start(self):
+        # Load the printing stack in the background
+        if self.printers is not None:
+            self.printers.start()
+        self.worker.warm_up(self.warm_up)
+
+    def warm_up(self):
+        # Runs on the print worker, before the first print needs it
+        self.labels.load_templates()
+        if not self.test_mode:
+            from src.printing import label_printer  # brother_ql, PIL and NumPy
+            # Keep the current minute's receipt rendered while idle
+            self.labels.prerender_receipt()
+            self.worker.idle_task = self.labels.prerender_receipt
+
+    def submit(self, job):
+        self.worker.submit(job)
+        return job
+
+    def bulk_print(self, path):
+        # Prints a receipt for every batch in the list at `path`
+        from src.printing.bulk_print import BulkPrint
+        if self.bulk is not None and not self.bulk.finished.is_set():
+            raise RuntimeError("A batch list is already printing")
+        self.bulk = BulkPrint(self, path)
+        self.bulk.start()
+        return self.bulk
+
+    def printer_status(self):
+        # One status per printer
+        if self.printers is None:
+            return []
+        return self.printers.snapshot()
+
+    def spool_status(self):
+        # Labels waiting in the spool, oldest first
+        if self.spool is None:
+            return []
+        return self.spool.snapshot()
+
+    def stop(self):
+        # Let queued jobs and journal writes finish before the process exits
+        if self.bulk is not None:
+            self.bulk.cancel()
+            self.bulk.join(timeout=30)
+        self.worker.stop()
+        self.worker.join(timeout=10)
+        if self.printers is not None:
+            self.printers.drain(timeout=30)
+        if self.journal is not None:
+            self.journal.stop()
+        if self.spool is not None:
+            self.spool.stop()
+        if self.printers is not None:
+            self.printers.stop()
@@ -0,0 +1,291 @@
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+SPOOL_PATH = 'print_spool.bin'
+MAGIC = b'NXSPOOL1'
+
+# Labels kept at most, further jobs print without a safety net
+MAX_ENTRIES = 50
+# Sends before a label needs the operator to retry it
+MAX_ATTEMPTS = 5
+# The file is rewritten with only the live labels once it grows past this
+COMPACT_BYTES = 1024 * 1024
+
+# Every record: payload length, CRC32 of kind and payload, kind
+RECORD = struct.Struct('<IIB')
+ADD, DONE, STATE = 1, 2, 3
+# ADD: id, spooled at, copies, raster rows, has journal record, then the
+# name, batch, START and FERDIG as length-prefixed UTF-8, then the raster
+ADD_HEAD = struct.Struct('<QdHIB')
+STRING = struct.Struct('<H')
+# DONE: id. STATE: id, attempts, then the error as UTF-8.
+DONE_BODY = struct.Struct('<Q')
+STATE_HEAD = struct.Struct('<QH')
+
+
+class SpooledError(Exception):
+    # A print failed but the label is kept and resent by the spool
+    def __init__(self, error):
+        super().__init__(f"{error}\nSaved, prints when the printer is back.")
+        self.error = error
+
+
+class SpoolEntry:
+    def __init__(self, id, name, copies, rows, data, record, spooled_at):
+        self.id = id
+        self.name = name
+        self.copies = copies
+        self.rows = rows
+        self.data = data
+        # batch, started_at and finished_at for the job journal, or None
+        self.record = record
+        self.spooled_at = spooled_at
+        self.attempts = 0
+        self.error = None
+        # queued: being printed, waiting: resent once a printer is ready,
+        # failed: tried MAX_ATTEMPTS times, waits for the operator
+        self.state = 'queued'
+
+    def encode_add(self):
+        record = self.record or {}
+        strings = b''.join(
+            STRING.pack(len(value)) + value
+            for value in (
+                str(text or '').encode('utf-8')
+                for text in (self.name, record.get('batch'), record.get('started_at'), record.get('finished_at'))
+            )
+        )
+        head = ADD_HEAD.pack(self.id, self.spooled_at, self.copies, self.rows, self.record is not None)
+        # Label rasters are mostly blank rows and compress very well
+        return encode(ADD, head + strings + zlib.compress(self.data, 1))
+
+    def encode_state(self):
+        return encode(STATE, STATE_HEAD.pack(self.id, self.attempts) + str(self.error or '').encode('utf-8'))
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'batch': self.record['batch'] if self.record else None,
+            'copies': self.copies,
+            'state': self.state,
+            'attempts': self.attempts,
+            'error': self.error,
+        }
+
+
+def encode(kind, payload):
+    return RECORD.pack(len(payload), zlib.crc32(bytes([kind]) + payload), kind) + payload
+
+
+def decode_add(payload):
+    id, spooled_at, copies, rows, has_record = ADD_HEAD.unpack_from(payload)
+    offset = ADD_HEAD.size
+    strings = []
+    for _ in range(4):
+        length, = STRING.unpack_from(payload, offset)
+        offset += STRING.size
+        strings.append(payload[offset:offset + length].decode('utf-8'))
+        offset += length
+    name, batch, started_at, finished_at = strings
+    record = None
+    if has_record:
+        record = {'batch': batch, 'started_at': started_at, 'finished_at': finished_at}
+    return SpoolEntry(id, name, copies, rows, zlib.decompress(payload[offset:]), record, spooled_at)
+
+
+def read_records(f):
+    # Yields (kind, payload) up to the first torn or corrupt record
+    while True:
+        head = f.read(RECORD.size)
+        if len(head) < RECORD.size:
+            return
+        length, crc, kind = RECORD.unpack(head)
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(bytes([kind]) + payload) != crc:
+            return
+        yield kind, payload
+
+
+class PrintSpool(threading.Thread):
+    # Compiled labels on disk until the printer has printed them, so a
+    # label survives an unplugged printer, an empty roll or a crash.
+    # Appends are batched into one fsync by the spool thread.
+    def __init__(self, path=SPOOL_PATH, max_entries=MAX_ENTRIES, max_attempts=MAX_ATTEMPTS):
+        super().__init__(name='print-spool', daemon=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.next_id = 1
+        self.records = queue.Queue()
+        # Set once the file has been read back, by the spool thread so
+        # startup doesn't wait for the SD card
+        self.loaded = threading.Event()
+        # Bumped on every change so the UI can tell when to redraw
+        self.changes = 0
+
+    def add(self, name, copies, data, rows, record=None):
+        # Returns the entry id, or None when the spool is full
+        self.loaded.wait()
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                print(f"Print spool full, {name} is not kept if it fails")
+                return None
+            entry = SpoolEntry(self.next_id, name, copies, rows, data, record, time.time())
+            self.next_id += 1
+            self.entries[entry.id] = entry
+            self.records.put(entry.encode_add())
+            self.changes += 1
+            return entry.id
+
+    def done(self, id):
+        # Printed, or discarded by the operator
+        with self.lock:
+            if self.entries.pop(id, None) is None:
+                return
+            self.records.put(encode(DONE, DONE_BODY.pack(id)))
+            self.changes += 1
+
+    def failed(self, id, error):
+        with self.lock:
+            entry = self.entries.get(id)
+            if entry is None:
+                return
+            entry.attempts += 1
+            entry.error = str(error)
+            entry.state = 'waiting' if entry.attempts < self.max_attempts else 'failed'
+            self.records.put(entry.encode_state())
+            self.changes += 1
+
+    def retry(self):
+        # Operator asked to try the failed labels again
+        with self.lock:
+            for entry in self.entries.values():
+                if entry.state == 'failed':
+                    entry.state = 'waiting'
+                    entry.attempts = 0
+                    self.records.put(entry.encode_state())
+                    self.changes += 1
+
+    def discard(self):
+        with self.lock:
+            failed = [id for id, entry in self.entries.items() if entry.state == 'failed']
+        for id in failed:
+            self.done(id)
+
+    def resume(self):
+        # Waiting labels in the order they were spooled, marked as queued
+        if not self.loaded.is_set():
+            return []
+        with self.lock:
+            entries = [entry for entry in self.entries.values() if entry.state == 'waiting']
+            for entry in entries:
+                entry.state = 'queued'
+            if entries:
+                self.changes += 1
+        return sorted(entries, key=lambda entry: entry.id)
+
+    def snapshot(self):
+        with self.lock:
+            return [entry.as_dict() for entry in sorted(self.entries.values(), key=lambda entry: entry.id)]
+
+    def stop(self, timeout=5):
+        self.records.put(None)
+        self.join(timeout)
+
+    def run(self):
+        self.load()
+        self.loaded.set()
+        f = open(self.path, 'ab')
+        stopping = False
+        while not stopping:
+            record = self.records.get()
+            if record is None:
+                break
+
+            # Everything that queued up meanwhile shares one fsync
+            batch = [record]
+            while True:
+                try:
+                    record = self.records.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stopping = True
+                    break
+                batch.append(record)
+
+            try:
+                f.write(b''.join(batch))
+                f.flush()
+                os.fsync(f.fileno())
+                if f.tell() > COMPACT_BYTES:
+                    f.close()
+                    self.compact()
+                    f = open(self.path, 'ab')
+            except OSError as e:
+                print(f"Print spool error: {e}")
+        f.close()
+
+    def load(self):
+        # Replays the file. A record torn by a crash mid-write is dropped
+        # by the compact() that follows.
+        entries = {}
+        try:
+            with open(self.path, 'rb') as f:
+                if f.read(len(MAGIC)) == MAGIC:
+                    for kind, payload in read_records(f):
+                        if kind == ADD:
+                            entry = decode_add(payload)
+                            entries[entry.id] = entry
+                            self.next_id = max(self.next_id, entry.id + 1)
+                        elif kind == DONE:
+                            entries.pop(DONE_BODY.unpack(payload)[0], None)
+                        elif kind == STATE:
+                            id, attempts = STATE_HEAD.unpack_from(payload)
+                            if id in entries:
+                                entries[id].attempts = attempts
+                                entries[id].error = payload[STATE_HEAD.size:].decode('utf-8') or None
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, zlib.error) as e:
+            print(f"Print spool unreadable, starting empty: {e}")
+
+        # Whatever was left over goes out again once a printer is ready
+        for entry in entries.values():
+            entry.state = 'waiting' if entry.attempts < self.max_attempts else 'failed'
+        with self.lock:
+            self.entries.update(entries)
+            self.changes += 1
+        if entries:
+            print(f"Print spool: {len(entries)} label(s) left from last run")
+        try:
+            self.compact()
+        except OSError as e:
+            print(f"Print spool error: {e}")
+
+    def compact(self):
+        # Rewrites the spool with only the live labels, atomically
+        with self.lock:
+            records = [MAGIC]
+            for entry in sorted(self.entries.values(), key=lambda entry: entry.id):
+                records.append(entry.encode_add())
+                if entry.attempts or entry.error:
+                    records.append(entry.encode_state())
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(b''.join(records))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
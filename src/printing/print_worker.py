@@ -0,0 +1,237 @@
+import queue
+import threading
+import time
+import traceback
+from src.printing.metrics import metrics
+from src.printing.print_spool import SpooledError
+from src.profiling import profiler
+
+# Seconds the worker waits for a job before running its idle task
+IDLE_INTERVAL = 1.0
+
+
+class PrintJob:
+    def __init__(self, name, render=None, copies=1, preview_path='temp_receipt.png',
+                 raster=None, record=None, reprint=None, spool_id=None, on_done=None, on_error=None):
+        self.name = name
+        # Called on the worker thread to produce the label image
+        self.render = render
+        # Optional shortcut returning the finished (data, rows) directly,
+        # used instead of render when printing for real
+        self.raster = raster
+        self.copies = copies
+        # batch, started_at and finished_at to store in the job journal
+        self.record = record
+        # Batch number to reprint from the journal instead of rendering,
+        # an empty string reprints the last label
+        self.reprint = reprint
+        # Set once the compiled label is in the print spool
+        self.spool_id = spool_id
+        # Only written in test mode when previews are requested
+        self.preview_path = preview_path
+        # Called on the Tk thread once the job has finished
+        self.on_done = on_done
+        self.on_error = on_error
+        # Seconds spent in each stage, for the metrics
+        self.timings = {}
+        self.submitted_at = None
+
+    @property
+    def batch(self):
+        # Keeps labels of one batch in order on the printers
+        if self.record is not None:
+            return self.record['batch']
+        return self.reprint
+
+
+class PrintWorker(threading.Thread):
+    def __init__(self, printers=None, journal=None, spool=None, test_mode=False, save_preview=False):
+        super().__init__(name='print-worker', daemon=True)
+        # The PrinterPool jobs are handed to once rendered
+        self.printers = printers
+        self.journal = journal
+        # Keeps compiled labels until printed, see PrintSpool
+        self.spool = spool
+        self.test_mode = test_mode
+        self.save_preview = save_preview
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        # Jobs submitted but not yet dispatched. Jobs come from the Tk
+        # thread and the print server, so it is updated under a lock.
+        self.pending = 0
+        self.pending_lock = threading.Lock()
+        # Run on the worker whenever it has been idle for IDLE_INTERVAL
+        self.idle_task = None
+
+    def submit(self, job):
+        job.submitted_at = time.monotonic()
+        with self.pending_lock:
+            self.pending += 1
+        self.jobs.put(job)
+
+    def stop(self):
+        self.jobs.put(None)
+
+    def run(self):
+        while True:
+            try:
+                idle = self.idle_task is not None or self.spool is not None
+                job = self.jobs.get(timeout=IDLE_INTERVAL if idle else None)
+            except queue.Empty:
+                self.resume_spool()
+                if self.idle_task is not None:
+                    self.run_task(self.idle_task)
+                continue
+            if job is None:
+                break
+            if not isinstance(job, PrintJob):
+                self.run_task(job)
+                continue
+            try:
+                if profiler.jobs_left:
+                    # Switched on at runtime, see profiling.py
+                    profiler.profile_job(self.process, job)
+                else:
+                    self.process(job)
+            except Exception as e:
+                self.finished(job, e)
+
+    def warm_up(self, task):
+        # Runs `task` on the worker thread, in order with the print jobs
+        self.jobs.put(task)
+
+    def run_task(self, task):
+        try:
+            task()
+        except Exception as e:
+            print(f"Print worker task failed: {e}")
+
+    def complete(self, job, error=None):
+        # Hands the job's callback over to whoever calls dispatch_results()
+        if error is None:
+            self.results.put((job.on_done, ()))
+        else:
+            self.results.put((job.on_error, (error,)))
+
+    def process(self, job):
+        if job.submitted_at is not None:
+            job.timings['queued'] = time.monotonic() - job.submitted_at
+            metrics.observe('label_pipeline_seconds', job.timings['queued'], stage='queued')
+
+        if self.test_mode:
+            print(f"Test Mode: {job.name} would be printed")
+            if job.render is not None:
+                image = job.render()
+                if self.save_preview:
+                    image.save(job.preview_path)
+                    print(f"Preview saved as {job.preview_path}")
+            self.finished(job)
+            return
+
+        # Deferred so startup doesn't pay for brother_ql, PIL and NumPy
+        from src.printing.label_printer import prepare_image, rasterize
+
+        # Labels kept from failed prints go out before this one
+        self.resume_spool()
+        
+        if job.reprint is not None:
+            # The stored raster is sent as is, nothing is re-rendered
+            with metrics.span('journal', job.timings):
+                data, rows = self.load_reprint(job.reprint)
+        elif job.raster is not None:
+            # Prerendered receipt, only the batch rows are drawn
+            with metrics.span('compose', job.timings):
+                data, rows = job.raster()
+        else:
+            # The image goes straight to the converter, nothing touches the disk
+            with metrics.span('render', job.timings):
+                image = job.render()
+            with metrics.span('convert', job.timings):
+                im = prepare_image(image)
+            with metrics.span('raster', job.timings):
+                data, rows = rasterize(im)
+        
+        # On disk before it goes out, so it survives a failed print or a crash
+        if self.spool is not None and job.spool_id is None:
+            job.spool_id = self.spool.add(job.name, job.copies, data, rows, job.record)
+
+        # The pool prints it while the next job renders
+        try:
+            self.printers.submit(
+                data,
+                rows,
+                job.copies,
+                batch=job.batch,
+                done=lambda printed: self.printed(job, data, rows, printed)
+            )
+        except Exception as e:
+            if job.spool_id is None:
+                raise
+            self.spool.failed(job.spool_id, e)
+            raise SpooledError(e)
+
+    def printed(self, job, data, rows, printed):
+        # Called on the printer's thread with the finished PoolJob
+        error = printed.error
+        if error is None:
+            if job.record is not None and self.journal is not None:
+                self.journal.record(copies=job.copies, data=data, rows=rows, **job.record)
+            if job.spool_id is not None:
+                self.spool.done(job.spool_id)
+        elif job.spool_id is not None:
+            self.spool.failed(job.spool_id, error)
+        metrics.job_finished(job.name, job.batch, job.copies, job.timings, list(printed.printers), error)
+        if error is not None and job.spool_id is not None:
+            error = SpooledError(error)
+        self.complete(job, error)
+
+    def finished(self, job, error=None):
+        metrics.job_finished(job.name, job.batch, job.copies, job.timings, [], error)
+        self.complete(job, error)
+
+    def resume_spool(self):
+        # Resends spooled labels, oldest first, once a printer is ready
+        if self.spool is None or not self.printers.ready():
+            return
+        for entry in self.spool.resume():
+            print(f"Resending spooled {entry.name} for batch {entry.record['batch'] if entry.record else '-'}")
+            job = PrintJob(
+                name=entry.name,
+                raster=lambda entry=entry: (entry.data, entry.rows),
+                copies=entry.copies,
+                record=entry.record,
+                spool_id=entry.id
+            )
+            with self.pending_lock:
+                self.pending += 1
+            try:
+                self.process(job)
+            except Exception as e:
+                self.finished(job, e)
+
+    def load_reprint(self, batch):
+        entry = self.journal.find(batch) if self.journal is not None else None
+        if entry is None:
+            if batch:
+                raise LookupError(f"No printed label found for batch {batch}")
+            raise LookupError("No printed label to reprint")
+        return entry['data'], entry['rows']
+
+    def dispatch_results(self):
+        # Runs callbacks of finished jobs. Called from the Tk thread, or
+        # from the print server's loop when running headless.
+        while True:
+            try:
+                callback, args = self.results.get_nowait()
+            except queue.Empty:
+                return
+            with self.pending_lock:
+                self.pending -= 1
+            if callback is None:
+                continue
+            try:
+                callback(*args)
+            except Exception:
+                # One broken callback mustn't hold up the other results
+                print("Print job callback failed:")
+                traceback.print_exc()
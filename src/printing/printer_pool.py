@@ -0,0 +1,271 @@
+import os
+import queue
+import threading
+import time
+from src.printing.metrics import error_name, metrics
+from src.printing.printer_session import PRINTER_IDENTIFIER, PrinterSession
+
+# Seconds between looks for printers plugged in while running
+DISCOVERY_INTERVAL = 5.0
+
+# Printers in these states take new jobs
+READY_STATES = ('idle', 'printing')
+
+
+def device_path(identifier):
+    # list_available_devices() hands out file:// URLs
+    if identifier.startswith('file://'):
+        return identifier[len('file://'):]
+    return identifier
+
+
+def discover_printers():
+    from brother_ql.backends.linux_kernel import list_available_devices
+    return sorted(device_path(device['identifier']) for device in list_available_devices())
+
+
+class PoolJob:
+    def __init__(self, data, rows, copies, batch, done):
+        self.data = data
+        self.rows = rows
+        self.copies = copies
+        self.batch = batch
+        # Called with the job once every copy has been handled
+        self.done = done
+        # The previous job for the same batch, printed before this one
+        self.after = None
+        self.parts_left = 0
+        self.error = None
+        # What each printer did with its copies, for the metrics
+        self.printers = []
+        self.finished = threading.Event()
+
+
+class PoolPart:
+    # Some of a job's copies, printed on one printer
+    def __init__(self, job, copies):
+        self.job = job
+        self.copies = copies
+        self.tried = set()
+
+
+class PrinterLane(threading.Thread):
+    def __init__(self, pool, identifier):
+        super().__init__(name=f'printer-{os.path.basename(identifier)}', daemon=True)
+        self.pool = pool
+        self.identifier = identifier
+        self.session = PrinterSession(identifier)
+        self.parts = queue.Queue()
+        # Pages queued or printing here, guarded by the pool's lock
+        self.queued_pages = 0
+
+    @property
+    def ready(self):
+        return self.session.monitor.state in READY_STATES
+
+    def put(self, part):
+        self.queued_pages += part.copies
+        part.tried.add(self)
+        self.parts.put(part)
+
+    def stop(self):
+        self.parts.put(None)
+        self.session.stop()
+
+    def run(self):
+        self.session.start()
+        from src.printing.label_printer import print_raster
+        while True:
+            part = self.parts.get()
+            if part is None:
+                break
+            job = part.job
+            # Keep labels of one batch in order, even across printers.
+            # Parts queued behind this one, like a retry of the batch's
+            # previous job, go first meanwhile.
+            if job.after is not None and not job.after.finished.is_set():
+                self.parts.put(part)
+                job.after.finished.wait(0.05)
+                continue
+            try:
+                status = print_raster(self.session, job.data, job.rows, part.copies)
+            except Exception as e:
+                metrics.count('label_printer_errors_total', printer=self.identifier, error=error_name(e))
+                job.printers.append({'printer': self.identifier, 'copies': part.copies, 'error': str(e)})
+                self.pool.part_failed(self, part, e)
+            else:
+                metrics.printed(self.identifier, status['timings'])
+                job.printers.append({
+                    'printer': self.identifier,
+                    'copies': part.copies,
+                    'ms': {stage: round(seconds * 1000, 2) for stage, seconds in status['timings'].items()},
+                })
+                self.pool.part_done(self, part, None)
+
+
+class PrinterPool(threading.Thread):
+    # Spreads jobs over every connected printer. Copies of one job fan out
+    # to idle printers, printers in an error state are skipped until they
+    # recover.
+    def __init__(self, identifiers=None):
+        super().__init__(name='printer-pool', daemon=True)
+        # Fixed printers, or None to find them with list_available_devices()
+        self.identifiers = identifiers
+        self.lock = threading.Lock()
+        self.lanes = []
+        self.last_by_batch = {}
+        # Jobs submitted whose done callback hasn't returned yet
+        self.active = 0
+        self.stopped = threading.Event()
+        # Set once the first look for printers is done
+        self.discovered = threading.Event()
+
+    def start(self):
+        if self.identifiers is not None:
+            for identifier in self.identifiers:
+                self.add(identifier)
+            self.discovered.set()
+        super().start()
+
+    def run(self):
+        if self.identifiers is not None:
+            return
+        while True:
+            self.discover()
+            self.discovered.set()
+            if self.stopped.wait(DISCOVERY_INTERVAL):
+                break
+
+    def discover(self):
+        try:
+            paths = discover_printers()
+        except Exception as e:
+            print(f"Printer discovery failed: {e}")
+            return
+        if not paths and not self.lanes:
+            # Nothing plugged in yet, wait for the usual device to appear
+            paths = [PRINTER_IDENTIFIER]
+        known = {lane.identifier for lane in self.lanes}
+        for path in paths:
+            if path not in known:
+                self.add(path)
+
+    def add(self, identifier):
+        lane = PrinterLane(self, identifier)
+        with self.lock:
+            self.lanes = self.lanes + [lane]
+        lane.start()
+        print(f"Printer added: {identifier}")
+
+    def stop(self):
+        self.stopped.set()
+        for lane in self.lanes:
+            lane.stop()
+
+    def drain(self, timeout):
+        # Waits for the printers to finish what they were given
+        deadline = time.monotonic() + timeout
+        while self.active:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def submit(self, data, rows, copies, batch=None, done=None):
+        self.discovered.wait(DISCOVERY_INTERVAL)
+        with self.lock:
+            if not self.lanes:
+                raise OSError("No printer found")
+            job = PoolJob(data, rows, copies, batch, done)
+            self.active += 1
+            if batch:
+                previous = self.last_by_batch.get(batch)
+                if previous is not None and not previous.finished.is_set():
+                    job.after = previous
+                self.last_by_batch[batch] = job
+
+            # With every printer in error the job goes ahead anyway and
+            # fails with the printer's error
+            lanes = [lane for lane in self.lanes if lane.ready] or self.lanes
+
+            # Each copy goes to the printer with the fewest pages waiting
+            load = {lane: lane.queued_pages for lane in lanes}
+            copies_by_lane = {}
+            for _ in range(copies):
+                lane = min(lanes, key=load.get)
+                load[lane] += 1
+                copies_by_lane[lane] = copies_by_lane.get(lane, 0) + 1
+
+            job.parts_left = len(copies_by_lane)
+            for lane, lane_copies in copies_by_lane.items():
+                lane.put(PoolPart(job, lane_copies))
+        return job
+
+    def reserve(self, pages):
+        # The ready printer with the fewest pages waiting, for a job that
+        # talks to its session directly. Its pages count as queued there
+        # until release(), so other jobs go elsewhere meanwhile.
+        self.discovered.wait(DISCOVERY_INTERVAL)
+        with self.lock:
+            if not self.lanes:
+                raise OSError("No printer found")
+            lanes = [lane for lane in self.lanes if lane.ready] or self.lanes
+            lane = min(lanes, key=lambda lane: lane.queued_pages)
+            lane.queued_pages += pages
+        return lane
+
+    def release(self, lane, pages):
+        with self.lock:
+            lane.queued_pages -= pages
+
+    def part_failed(self, lane, part, error):
+        with self.lock:
+            lane.queued_pages -= part.copies
+            # Another healthy printer picks up what this one couldn't print
+            others = [other for other in self.lanes if other.ready and other not in part.tried]
+            if others:
+                other = min(others, key=lambda other: other.queued_pages)
+                print(f"{lane.identifier} failed ({error}), retrying on {other.identifier}")
+                metrics.count('label_retries_total', part.copies)
+                other.put(part)
+                return
+        self.finish_part(part, error)
+
+    def part_done(self, lane, part, error):
+        with self.lock:
+            lane.queued_pages -= part.copies
+        self.finish_part(part, error)
+
+    def finish_part(self, part, error):
+        job = part.job
+        with self.lock:
+            job.parts_left -= 1
+            if error is not None and job.error is None:
+                job.error = error
+            if job.parts_left:
+                return
+            if self.last_by_batch.get(job.batch) is job:
+                del self.last_by_batch[job.batch]
+        job.finished.set()
+        try:
+            if job.done is not None:
+                job.done(job)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def ready(self):
+        return any(lane.ready for lane in self.lanes)
+
+    def changes(self):
+        # Changes whenever any printer's status does, or a printer is added
+        return sum(lane.session.monitor.changes for lane in self.lanes) + len(self.lanes)
+
+    def snapshot(self):
+        statuses = []
+        for lane in self.lanes:
+            status = lane.session.monitor.snapshot()
+            status['printer'] = lane.identifier
+            status['queued_pages'] = lane.queued_pages
+            statuses.append(status)
+        return statuses
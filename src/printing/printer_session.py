@@ -0,0 +1,119 @@
+import errno
+import threading
+import time
+from src.printing.status_monitor import StatusMonitor
+
+PRINTER_IDENTIFIER = '/dev/usb/lp0'
+
+# Errors that mean the device handle went stale (unplugged, power cycled)
+RECONNECT_ERRNOS = (errno.EIO, errno.ENODEV, errno.ENXIO, errno.EBADF, errno.ENOENT)
+
+# How long to wait for the printer to report back, per page
+STATUS_TIMEOUT = 10
+
+
+class PrinterError(Exception):
+    pass
+
+
+class PrinterSession:
+    def __init__(self, identifier=PRINTER_IDENTIFIER):
+        self.identifier = identifier
+        self.printer = None
+        self.last_status = None
+        # Guards the device handle, shared by the jobs and the monitor
+        self.lock = threading.RLock()
+        # Only one job talks to the printer at a time
+        self.job_lock = threading.Lock()
+        # Reads everything the printer reports and tracks its state
+        self.monitor = StatusMonitor(self)
+
+    def start(self):
+        self.monitor.start()
+
+    def stop(self):
+        self.monitor.stop()
+        self.close()
+
+    def open(self):
+        with self.lock:
+            if self.printer is None:
+                from brother_ql.backends.linux_kernel import BrotherQLBackendLinuxKernel
+                self.printer = BrotherQLBackendLinuxKernel(self.identifier)
+            return self.printer
+
+    def fileno(self):
+        return self.open().dev
+
+    def close(self, fd=None):
+        with self.lock:
+            # A stale fd from the monitor must not close a newer handle
+            if self.printer is not None and fd in (None, self.printer.dev):
+                self.printer.dispose()
+                self.printer = None
+
+    def reopen(self):
+        with self.lock:
+            self.close()
+            return self.open()
+
+    def write(self, data):
+        with self.lock:
+            try:
+                self.open().write(data)
+            except OSError as e:
+                if e.errno not in RECONNECT_ERRNOS:
+                    raise
+                # The printer was replugged, try once more on a fresh handle
+                self.reopen().write(data)
+
+    def check_ready(self):
+        # Fail fast instead of sending a job into a known error, but ask
+        # again first in case the operator has fixed it since
+        if self.monitor.state != 'error':
+            return
+        if self.monitor.refresh() == 'error':
+            raise PrinterError(', '.join(self.monitor.errors))
+
+    def print_instructions(self, instructions, num_pages=1):
+        with self.job_lock:
+            self.check_ready()
+            self.monitor.begin_job(num_pages)
+            try:
+                started = time.monotonic()
+                self.write(instructions)
+                written = time.monotonic() - started
+                self.last_status = self.monitor.wait_for_job(STATUS_TIMEOUT * num_pages)
+                self.last_status['timings']['write'] = written
+            finally:
+                self.monitor.end_job()
+        if self.last_status['outcome'] == 'error':
+            raise PrinterError(', '.join(self.last_status['errors']))
+        return self.last_status
+
+    def print_stream(self, pages, num_pages):
+        # One job written page by page while `pages` produces it, so only
+        # the page being sent is in memory. num_pages is an upper bound,
+        # the job ends after the last page `pages` yields. Writing stops
+        # at the first printer error.
+        with self.job_lock:
+            self.check_ready()
+            self.monitor.begin_job(num_pages)
+            sent = 0
+            try:
+                started = time.monotonic()
+                for page in pages:
+                    progress = self.monitor.job_progress()
+                    if progress is not None and progress[1]:
+                        break
+                    self.write(page)
+                    sent += 1
+                written = time.monotonic() - started
+                self.monitor.set_job_pages(sent)
+                self.last_status = self.monitor.wait_for_job(STATUS_TIMEOUT * max(sent, 1))
+                self.last_status['timings']['write'] = written
+            finally:
+                self.monitor.end_job()
+        if self.last_status['outcome'] == 'error':
+            raise PrinterError(', '.join(self.last_status['errors']))
+        return self.last_status
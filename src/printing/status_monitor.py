@@ -0,0 +1,262 @@
+import os
+import select
+import threading
+import time
+
+STATUS_HEADER = b'\x80\x20\x42'
+STATUS_LENGTH = 32
+
+# ESC i S, and the invalidate/initialize sequence sent on a fresh handle
+STATUS_REQUEST = b'\x1B\x69\x53'
+RESET_AND_STATUS_REQUEST = b'\x00' * 200 + b'\x1B\x40' + STATUS_REQUEST
+
+# Seconds; the poll timeout only bounds how quickly stop() is noticed
+POLL_TIMEOUT = 1.0
+# While idle the printer is asked for its status this often, so a
+# cover opened or roll removed between jobs is noticed before printing
+PROBE_INTERVAL = 10.0
+# Asked more often while in error, so spooled labels go out soon after
+# the operator has fixed it
+ERROR_PROBE_INTERVAL = 2.0
+RECONNECT_INTERVAL = 2.0
+
+POLL_ERRORS = select.POLLERR | select.POLLHUP | select.POLLNVAL
+
+
+class StatusMonitor(threading.Thread):
+    def __init__(self, session):
+        super().__init__(name='printer-status', daemon=True)
+        self.session = session
+        self.condition = threading.Condition()
+        self.stopped = threading.Event()
+
+        # Current printer state: offline, idle, printing or error
+        self.state = 'offline'
+        self.phase = None
+        self.errors = []
+        self.media = None
+        self.last_response = None
+        self.last_response_time = 0
+        # Bumped on every change so the UI can tell when to redraw
+        self.changes = 0
+        self.responses = 0
+
+        self.job = None
+        self.fd = None
+
+    def stop(self):
+        self.stopped.set()
+
+    def snapshot(self):
+        with self.condition:
+            return {
+                'state': self.state,
+                'phase': self.phase,
+                'errors': list(self.errors),
+                'media': self.media,
+            }
+
+    def run(self):
+        buffer = b''
+        while not self.stopped.is_set():
+            try:
+                fd = self.session.fileno()
+            except OSError as e:
+                self.set_offline(str(e))
+                self.stopped.wait(RECONNECT_INTERVAL)
+                continue
+
+            if fd != self.fd:
+                # Fresh handle, ask the printer where it stands unless a
+                # job is being written to it right now
+                self.fd = fd
+                buffer = b''
+                if self.job is None:
+                    self.request_status(RESET_AND_STATUS_REQUEST)
+
+            poller = select.poll()
+            poller.register(fd, select.POLLIN | select.POLLPRI)
+            events = poller.poll(POLL_TIMEOUT * 1000)
+
+            if not events:
+                if self.should_probe():
+                    self.request_status()
+                continue
+
+            mask = events[0][1]
+            if mask & POLL_ERRORS:
+                self.disconnected(fd, 'Printer disconnected')
+                continue
+
+            try:
+                data = os.read(fd, 64)
+            except OSError as e:
+                self.disconnected(fd, str(e))
+                continue
+            if not data:
+                # Readable but empty; don't let a confused device make us spin
+                self.stopped.wait(POLL_TIMEOUT / 10)
+                continue
+
+            buffer += data
+            buffer = self.consume_frames(buffer)
+
+    def consume_frames(self, buffer):
+        # Imported on the monitor thread, not during startup
+        from brother_ql.reader import interpret_response
+        while True:
+            start = buffer.find(STATUS_HEADER)
+            if start < 0:
+                # Keep a possible partial header at the end
+                return buffer[-(len(STATUS_HEADER) - 1):]
+            if len(buffer) - start < STATUS_LENGTH:
+                return buffer[start:]
+            frame = buffer[start:start + STATUS_LENGTH]
+            buffer = buffer[start + STATUS_LENGTH:]
+            try:
+                result = interpret_response(frame)
+            except (NameError, ValueError):
+                print(f"Couldn't understand printer response: {frame!r}")
+                continue
+            self.handle_response(result)
+
+    def handle_response(self, result):
+        with self.condition:
+            self.last_response = result
+            self.last_response_time = time.monotonic()
+            self.responses += 1
+            self.phase = result['phase_type']
+            self.errors = result['errors']
+            self.media = result['media_type']
+
+            job = self.job
+            if job is not None:
+                if result['errors']:
+                    job['errors'] = result['errors']
+                if result['status_type'] == 'Printing completed':
+                    job['pages_printed'] += 1
+                    # When the first and the last page came out
+                    job['times'].setdefault('first_page', self.last_response_time)
+                    if job['pages_printed'] == job['num_pages']:
+                        job['times']['printed'] = self.last_response_time
+                if (result['status_type'] == 'Phase change'
+                        and result['phase_type'] == 'Waiting to receive'
+                        and job['pages_printed'] >= job['num_pages']):
+                    job['ready'] = True
+                    job['times']['ready'] = self.last_response_time
+
+            if result['errors']:
+                self.state = 'error'
+            elif result['phase_type'] == 'Printing state' or (job is not None and not job['ready']):
+                self.state = 'printing'
+            else:
+                self.state = 'idle'
+
+            self.changes += 1
+            self.condition.notify_all()
+
+    def set_offline(self, reason):
+        with self.condition:
+            if self.state == 'offline' and self.errors == [reason]:
+                return
+            self.state = 'offline'
+            self.phase = None
+            self.errors = [reason]
+            self.changes += 1
+            self.condition.notify_all()
+
+    def disconnected(self, fd, reason):
+        self.fd = None
+        self.session.close(fd)
+        self.set_offline(reason)
+
+    def should_probe(self):
+        with self.condition:
+            if self.job is not None:
+                return False
+            interval = ERROR_PROBE_INTERVAL if self.state == 'error' else PROBE_INTERVAL
+            return time.monotonic() - self.last_response_time >= interval
+
+    def request_status(self, request=STATUS_REQUEST):
+        # Pretend we just heard from the printer so an unanswered request
+        # is not repeated on every poll timeout
+        with self.condition:
+            self.last_response_time = time.monotonic()
+        try:
+            self.session.write(request)
+        except OSError as e:
+            self.set_offline(str(e))
+
+    def refresh(self, timeout=1.0):
+        # Ask for a fresh status and wait for the answer
+        with self.condition:
+            responses = self.responses
+        self.request_status()
+        with self.condition:
+            self.condition.wait_for(lambda: self.responses > responses, timeout)
+            return self.state
+
+    def begin_job(self, num_pages):
+        with self.condition:
+            self.job = {
+                'num_pages': num_pages,
+                'pages_printed': 0,
+                'ready': False,
+                'errors': [],
+                'started': time.monotonic(),
+                'times': {},
+            }
+            self.state = 'printing'
+            self.changes += 1
+
+    def set_job_pages(self, num_pages):
+        # A streamed job may end up shorter than announced in begin_job()
+        with self.condition:
+            job = self.job
+            job['num_pages'] = num_pages
+            if job['pages_printed'] >= num_pages and self.phase == 'Waiting to receive':
+                job['ready'] = True
+                job['times'].setdefault('ready', time.monotonic())
+            self.condition.notify_all()
+
+    def job_progress(self):
+        # (pages printed, errors) of the running job, or None between jobs
+        with self.condition:
+            if self.job is None:
+                return None
+            return self.job['pages_printed'], list(self.job['errors'])
+
+    def wait_for_job(self, timeout):
+        # Blocks on the condition until the reader thread has seen the job
+        # through; nothing spins while the printer works
+        with self.condition:
+            job = self.job
+            self.condition.wait_for(
+                lambda: job['errors'] or job['ready'] or self.state == 'offline',
+                timeout
+            )
+            did_print = job['pages_printed'] >= job['num_pages']
+            if job['errors'] or self.state == 'offline':
+                outcome = 'error'
+            elif did_print:
+                outcome = 'printed'
+            else:
+                outcome = 'sent'
+            return {
+                'instructions_sent': True,
+                'outcome': outcome,
+                'printer_state': self.last_response,
+                'errors': list(job['errors'] or (self.errors if self.state == 'offline' else [])),
+                'did_print': did_print,
+                'pages_printed': job['pages_printed'],
+                'ready_for_next_job': job['ready'],
+                # Seconds from begin_job() until each stage was reported
+                'timings': {stage: at - job['started'] for stage, at in job['times'].items()},
+            }
+
+    def end_job(self):
+        with self.condition:
+            self.job = None
+            if self.state == 'printing':
+                self.state = 'idle'
+            self.changes += 1
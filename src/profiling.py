@@ -0,0 +1,238 @@
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+# Timestamped result files, for pulling off the device
+PROFILE_DIR = 'profiles'
+# Print jobs profiled per request
+PROFILE_JOBS = 20
+# Lines in each text report
+TOP_LINES = 40
+# Stack depth recorded per allocation once memory tracing is on
+MEMORY_FRAMES = 5
+
+# What the app imports at start and on the first print, timed in a fresh
+# interpreter with -X importtime
+IMPORT_SCRIPT = (
+    'import src.printing.print_service, src.printing.label_printer, '
+    'src.printing.label_template, src.app'
+)
+
+
+def timestamp():
+    return time.strftime('%Y%m%d-%H%M%S')
+
+
+class Profiler:
+    # Profiling that can be switched on in a running kiosk: cProfile over
+    # the print worker for the next N jobs, tracemalloc snapshots with a
+    # diff against the previous one, and an import time breakdown. Costs
+    # one attribute check per job while off.
+    def __init__(self, directory=PROFILE_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        # Jobs still to profile, and the profile they go into
+        self.jobs_left = 0
+        self.profiled = []
+        self.profile = None
+        self.previous_snapshot = None
+        # Files written so far and what is running, for the settings popup
+        self.files = []
+        self.state = "Idle"
+        # Requests from the signal handlers, run on the profiler thread
+        self.requests = deque()
+        self.requested = threading.Event()
+        self.logger = None
+
+    def install_signals(self):
+        # kill -USR1 <pid> profiles the next jobs, kill -USR2 <pid> writes
+        # a memory snapshot. Python runs the handlers on the main thread
+        # between two bytecodes, maybe while it holds self.lock, so they
+        # only queue the request for the profiler thread.
+        import signal
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.request(self.profile_jobs))
+        signal.signal(signal.SIGUSR2, lambda signum, frame: self.request(self.write_memory_snapshot))
+        threading.Thread(target=self.run_requests, name='profiler-signals', daemon=True).start()
+
+    def request(self, action):
+        self.requests.append(action)
+        self.requested.set()
+
+    def run_requests(self):
+        while True:
+            self.requested.wait()
+            self.requested.clear()
+            while self.requests:
+                action = self.requests.popleft()
+                try:
+                    action()
+                except Exception:
+                    # Keep the thread alive for the next signal
+                    self.log(f"Profiler request {action.__name__} failed:\n{traceback.format_exc().rstrip()}")
+
+    def log(self, message):
+        # Imported on first use, logging isn't needed to start the app
+        if self.logger is None:
+            import logging
+            logger = logging.getLogger('profiling')
+            if not logger.handlers:
+                handler = logging.StreamHandler()
+                handler.setFormatter(logging.Formatter('%(asctime)s %(name)s: %(message)s'))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+            self.logger = logger
+        self.logger.info(message)
+
+    def path(self, kind, extension):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{kind}-{timestamp()}.{extension}")
+
+    def wrote(self, path):
+        with self.lock:
+            self.files.append(path)
+        self.log(f"Profile written to {path}")
+
+    def profile_jobs(self, jobs=PROFILE_JOBS):
+        import cProfile
+        with self.lock:
+            if self.jobs_left:
+                return
+            self.profile = cProfile.Profile()
+            self.profiled = []
+            self.jobs_left = jobs
+            self.state = f"Profiling the next {jobs} print jobs"
+        self.log(f"Profiling the next {jobs} print jobs")
+
+    def profile_job(self, process, job):
+        # Runs process(job) on the print worker under the profiler
+        profile = self.profile
+        profile.enable()
+        try:
+            process(job)
+        finally:
+            profile.disable()
+            with self.lock:
+                self.profiled.append(job.name)
+                self.jobs_left -= 1
+                done = self.jobs_left == 0
+                if done:
+                    jobs = self.profiled
+                    self.profile = None
+                else:
+                    self.state = f"Profiling, {self.jobs_left} print jobs to go"
+            if done:
+                self.write_job_profile(profile, jobs)
+
+    def write_job_profile(self, profile, jobs):
+        import io
+        import pstats
+        try:
+            path = self.path('jobs', 'prof')
+            profile.dump_stats(path)
+            report = io.StringIO()
+            report.write(f"{len(jobs)} print jobs: {', '.join(sorted(set(jobs)))}\n")
+            report.write("Print worker thread only, the printer threads mostly wait on the device\n")
+            stats = pstats.Stats(profile, stream=report)
+            stats.sort_stats('cumulative').print_stats(TOP_LINES)
+            stats.sort_stats('tottime').print_stats(TOP_LINES)
+            with open(path[:-len('.prof')] + '.txt', 'w') as f:
+                f.write(report.getvalue())
+            self.wrote(path)
+        except OSError as e:
+            self.log(f"Could not write profile: {e}")
+        with self.lock:
+            self.state = "Idle"
+
+    def memory_snapshot(self):
+        # The first call starts tracing, the next ones write what is
+        # allocated and what changed since the previous snapshot
+        threading.Thread(target=self.write_memory_snapshot, name='profiler', daemon=True).start()
+
+    def write_memory_snapshot(self):
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(MEMORY_FRAMES)
+            self.previous_snapshot = None
+            with self.lock:
+                self.state = "Tracing memory, take another snapshot for the allocations"
+            self.log("Tracing memory, take another snapshot for the allocations")
+            return
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"Traced {current / 1024 / 1024:.1f} MB, peak {peak / 1024 / 1024:.1f} MB", "", "Top allocations:"]
+        lines += [str(stat) for stat in snapshot.statistics('lineno')[:TOP_LINES]]
+        if self.previous_snapshot is not None:
+            lines += ["", "Change since the previous snapshot:"]
+            lines += [str(stat) for stat in snapshot.compare_to(self.previous_snapshot, 'lineno')[:TOP_LINES]]
+        self.previous_snapshot = snapshot
+        try:
+            path = self.path('memory', 'txt')
+            with open(path, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+            self.wrote(path)
+        except OSError as e:
+            self.log(f"Could not write memory snapshot: {e}")
+        with self.lock:
+            self.state = "Tracing memory"
+
+    def stop_memory(self):
+        import tracemalloc
+        tracemalloc.stop()
+        self.previous_snapshot = None
+        with self.lock:
+            self.state = "Idle"
+
+    def import_times(self):
+        # Timed in a fresh interpreter, so it shows a cold start's imports
+        # without touching the running app
+        threading.Thread(target=self.write_import_times, name='profiler', daemon=True).start()
+
+    def write_import_times(self):
+        import subprocess
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', IMPORT_SCRIPT],
+            cwd=root, capture_output=True, text=True
+        )
+        imports = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            own, cumulative, name = line[len('import time:'):].split('|')
+            imports.append((int(own), int(cumulative), name.rstrip()))
+        if not imports:
+            self.log(f"Import times failed: {result.stderr.strip()}")
+            return
+
+        lines = [f"{'self ms':>8} {'total ms':>9}  module"]
+        for title, key in (("By total time", 1), ("By own time", 0)):
+            lines += ["", title + ":"]
+            for own, cumulative, name in sorted(imports, key=lambda i: -i[key])[:TOP_LINES]:
+                lines.append(f"{own / 1000:8.1f} {cumulative / 1000:9.1f}  {name}")
+        # Lazily imported packages the running app has loaded so far
+        heavy = ('brother_ql', 'PIL', 'numpy', 'yaml', 'usb', 'evdev', 'sqlite3')
+        lines += ["", "Loaded in this process: " + ", ".join(name for name in heavy if name in sys.modules)]
+        try:
+            path = self.path('imports', 'txt')
+            with open(path, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+            self.wrote(path)
+        except OSError as e:
+            self.log(f"Could not write import times: {e}")
+
+    def status(self):
+        with self.lock:
+            last = os.path.basename(self.files[-1]) if self.files else "none yet"
+            return f"{self.state}\nLast file: {last}"
+
+
+# Shared by main.py, the print worker and the settings screen
+profiler = Profiler()
@@ -1,15 +1,21 @@
 import tkinter as tk
-from PIL import Image, ImageDraw, ImageFont
 import os
-from brother_ql.conversion import convert
-from brother_ql.backends.helpers import send
-from brother_ql.raster import BrotherQLRaster
-from datetime import datetime, timedelta
+import time
+from collections import deque
+from src.printing.label_values import MAX_BATCH_LENGTH
+from src.ui_latency import ui_latency
+
+LOGO_PATH = "assets/Nexans_logo.svg.png"
+# The logo pre-scaled to 40px, in a format Tk loads without PIL
+LOGO_CACHE_PATH = "assets/Nexans_logo_40.png"
+LOGO_HEIGHT = 40
 
 class PrinterScreen(tk.Frame):
-    def __init__(self, parent, config_manager, show_settings):
+    def __init__(self, parent, config_manager, labels, show_settings):
         super().__init__(parent, bg='white')
         self.config_manager = config_manager
+        # Builds the print jobs, see LabelJobs
+        self.labels = labels
         self.show_settings = show_settings
         
         # Style configuration
@@ -20,8 +26,19 @@ class PrinterScreen(tk.Frame):
             'font': 'Nohemi-Bold'
         }
         
-        # Easter egg tracking
-        self.backspace_times = []
+        # Easter egg tracking, the last 5 backspace presses on 000
+        self.backspace_times = deque(maxlen=5)
+        
+        # The error popup, if open, and how many errors it has shown
+        self.error_popup = None
+        self.error_count = 0
+        
+        # Labels in the print spool and the popup listing them, if open
+        self.spool_entries = []
+        self.spool_popup = None
+        
+        # Popup for printing a batch list from a USB stick, if open
+        self.bulk_popup = None
         
         self.setup_ui()
         
@@ -59,7 +76,17 @@ class PrinterScreen(tk.Frame):
             relief='flat',
             bd=2
         )
-        self.batch_display.pack(pady=(0, 30))
+        self.batch_display.pack()
+        
+        # Last batch read by the barcode scanner thread, see show_scan()
+        self.scan_label = tk.Label(
+            center_frame,
+            text="",
+            font=(self.style['font'], 12),
+            fg='#999999',
+            bg='white'
+        )
+        self.scan_label.pack(pady=(0, 12))
         
         # Bind Enter key to print
         self.batch_display.bind('<Return>', lambda e: self.print_receipt())
@@ -83,6 +110,35 @@ class PrinterScreen(tk.Frame):
         )
         self.print_button.pack()
         
+        # Reprints the journaled label for the entered batch, or the last
+        # label when the input is empty
+        self.reprint_button = tk.Button(
+            center_frame,
+            text="REPRINT",
+            command=self.reprint_label,
+            font=(self.style['font'], 14),
+            bg='white',
+            fg=self.style['button_color'],
+            activebackground='white',
+            activeforeground=self.style['button_active'],
+            relief='flat'
+        )
+        self.reprint_button.pack(pady=(10, 0))
+        
+        # Prints a label for every batch in a list on a USB stick
+        self.bulk_button = tk.Button(
+            center_frame,
+            text="BATCH LIST",
+            command=self.show_bulk_popup,
+            font=(self.style['font'], 14),
+            bg='white',
+            fg=self.style['button_color'],
+            activebackground='white',
+            activeforeground=self.style['button_active'],
+            relief='flat'
+        )
+        self.bulk_button.pack()
+        
         # Right side - Numpad
         numpad_frame = tk.Frame(main_container, bg='white')
         numpad_frame.pack(side='right', padx=(20, 0))
@@ -90,20 +146,36 @@ class PrinterScreen(tk.Frame):
         # Create numpad
         self.create_numpad(numpad_frame)
         
-        # Load and create logo for GUI
-        logo_image = Image.open("assets/Nexans_logo.svg.png")
-        # Resize logo to height of 40px while maintaining aspect ratio
-        logo_ratio = logo_image.width / logo_image.height
-        logo_image = logo_image.resize((int(40 * logo_ratio), 40), Image.Resampling.LANCZOS)
-        # Save temporarily and load as PhotoImage
-        logo_image.save("temp_logo.png")
-        self.logo_photo = tk.PhotoImage(file="temp_logo.png")
-        os.remove("temp_logo.png")
+        # Load the logo for GUI
+        self.logo_photo = tk.PhotoImage(file=self.cached_logo_path())
         
         # Add logo to bottom left of window
         logo_label = tk.Label(self, image=self.logo_photo, bg='white')
         logo_label.place(relx=0.02, rely=0.95, anchor='sw')
         
+        # Printer status in bottom right, filled in by the status monitor
+        self.printer_status_label = tk.Label(
+            self,
+            text="",
+            font=(self.style['font'], 14),
+            fg='#999999',
+            bg='white'
+        )
+        self.printer_status_label.place(relx=0.98, rely=0.95, anchor='se')
+        
+        # Labels kept after a failed print, placed by show_spool()
+        self.spool_button = tk.Button(
+            self,
+            text="",
+            command=self.show_spool_popup,
+            font=(self.style['font'], 14),
+            bg='white',
+            fg=self.style['button_color'],
+            activebackground='white',
+            activeforeground=self.style['button_active'],
+            relief='flat'
+        )
+        
         # Settings button in top right
         settings_button = tk.Button(
             self,
@@ -119,6 +191,46 @@ class PrinterScreen(tk.Frame):
         )
         settings_button.place(x=self.winfo_screenwidth()-100, y=20)
         
+        # Black/red tape in top left, batch numbers then print in red
+        self.two_color_button = tk.Button(
+            self,
+            command=self.toggle_two_color,
+            font=(self.style['font'], 14),
+            bg='white',
+            activebackground='white',
+            relief='flat'
+        )
+        self.two_color_button.place(x=20, y=20)
+        self.update_two_color_button()
+        
+    @ui_latency.timed('two color')
+    def toggle_two_color(self):
+        self.config_manager.set_two_color(not self.config_manager.get_two_color())
+        self.update_two_color_button()
+        self.batch_display.focus_set()
+
+    def update_two_color_button(self):
+        if self.config_manager.get_two_color():
+            self.two_color_button.configure(
+                text="● BLACK/RED TAPE",
+                fg=self.style['button_color'],
+                activeforeground=self.style['button_active']
+            )
+        else:
+            self.two_color_button.configure(text="○ BLACK/RED TAPE", fg='#999999', activeforeground='#999999')
+        
+    def cached_logo_path(self):
+        if not os.path.exists(LOGO_CACHE_PATH):
+            # Only needed if the cached logo is missing, so PIL isn't
+            # imported on a normal start
+            from PIL import Image
+            logo_image = Image.open(LOGO_PATH)
+            # Resize logo to height of 40px while maintaining aspect ratio
+            logo_ratio = logo_image.width / logo_image.height
+            logo_image = logo_image.resize((int(LOGO_HEIGHT * logo_ratio), LOGO_HEIGHT), Image.Resampling.LANCZOS)
+            logo_image.save(LOGO_CACHE_PATH)
+        return LOGO_CACHE_PATH
+        
     def create_numpad(self, parent):
         numpad_layout = [
             ['7', '8', '9'],
@@ -151,29 +263,27 @@ class PrinterScreen(tk.Frame):
             activebackground=self.style['button_active']
         )
                 
+    @ui_latency.timed('numpad')
     def numpad_press(self, key):
         current = self.batch_display.get()
         
         if key == '⌫':  # Backspace
             if current == '000':  # Easter egg check
-                now = datetime.now()
-                # Remove old timestamps (older than 3 seconds)
-                self.backspace_times = [t for t in self.backspace_times 
-                                      if (now - t).total_seconds() <= 3]
-                # Add new timestamp
+                now = time.monotonic()
+                # Add new timestamp, the oldest drops out
                 self.backspace_times.append(now)
                 
                 # Check if we have 5 presses within 3 seconds
-                if len(self.backspace_times) >= 5:
+                if len(self.backspace_times) == 5 and now - self.backspace_times[0] <= 3:
                     self.print_easter_egg()
-                    self.backspace_times = []  # Reset after showing
+                    self.backspace_times.clear()  # Reset after showing
             
             self.batch_display.config(state='normal')
             self.batch_display.delete(len(current)-1, tk.END)
         elif key == 'C':  # Clear
             self.batch_display.config(state='normal')
             self.batch_display.delete(0, tk.END)
-        elif len(current) < 10:  # Max length is 10 digits
+        elif len(current) < MAX_BATCH_LENGTH:
             self.batch_display.config(state='normal')
             self.batch_display.insert(tk.END, key)
             
@@ -183,83 +293,246 @@ class PrinterScreen(tk.Frame):
         # Ensure input field maintains focus after any button press
         self.batch_display.focus_set()
 
-    def create_receipt_image(self):
-        # Create a new image with white background
-        width = 800  # Width for 70mm tape
-        height = 365  # ~32mm height
-        image = Image.new('RGB', (width, height), 'white')
-        draw = ImageDraw.Draw(image)
-        
-        try:
-            title_font = ImageFont.truetype("assets/Nohemi/OpenType-TT/Nohemi-Bold.ttf", 63)
-            time_font = ImageFont.truetype("assets/Nohemi/OpenType-TT/Nohemi-Bold.ttf", 48)
-        except:
-            title_font = time_font = ImageFont.load_default()
-        
-        # Get current time and finish time
-        now = datetime.now()
-        drying_hours = self.config_manager.get_drying_time()
-        finish_time = now + timedelta(hours=drying_hours)
-        
-        # Format times
-        start_str = now.strftime("%d/%m-%Y %H:%M")
-        finish_str = finish_time.strftime("%d/%m-%Y %H:%M")
-        
-        # Get batch number
-        batch = self.batch_display.get()
-        
-        # Calculate positions
-        y_spacing = 55  # Spacing between lines
-        left_margin = 50
-        right_margin = width - 50  # 50px from right edge
-        
-        # Draw times
-        draw.text((left_margin, 50), "START:", font=time_font, fill='black')
-        draw.text((left_margin, 50 + y_spacing*2), "FERDIG:", font=time_font, fill='black')
-        
-        # Right-align time values
-        start_width = time_font.getlength(start_str)
-        finish_width = time_font.getlength(finish_str)
-        draw.text((right_margin - start_width, 50), start_str, font=time_font, fill='black')
-        draw.text((right_margin - finish_width, 50 + y_spacing*2), finish_str, font=time_font, fill='black')
-        
-        # Show batch if entered
-        if batch.strip():  # If there's any batch number
-            draw.text((left_margin, 50 + y_spacing*4), "BATCH:", font=title_font, fill='black')
-            batch_width = title_font.getlength(batch)
-            draw.text((right_margin - batch_width, 50 + y_spacing*4), batch, font=title_font, fill='black')
-        
-        return image
-
     def show_printing_feedback(self):
-        # Disable and gray out the button
-        self.print_button.configure(
-            state='disabled',
-            bg='#cccccc',
-            activebackground='#cccccc'
+        pending = self.winfo_toplevel().print_worker.pending
+        
+        # Create the printing message once and reuse it for every job
+        if not hasattr(self, 'status_label'):
+            self.status_label = tk.Label(
+                self,
+                font=(self.style['font'], 28),
+                fg='#cccccc',
+                bg='white'
+            )
+        self.status_label.configure(
+            text="Printing..." if pending <= 1 else f"Printing... ({pending})"
         )
         
-        # Create and show the printing message
-        self.status_label = tk.Label(
-            self,
-            text="Printing...",
-            font=(self.style['font'], 28),
-            fg='#cccccc',
-            bg='white'
-        )
         # Position it above the button
         button_x = self.print_button.winfo_rootx() - self.winfo_rootx()
         button_y = self.print_button.winfo_rooty() - self.winfo_rooty() - 50
         self.status_label.place(x=button_x, y=button_y)
-        
-        # Schedule the restoration after 3 seconds
-        self.after(3000, self.restore_button)
 
-    def restore_button(self):
-        # Remove the status label
+    def hide_printing_feedback(self):
         if hasattr(self, 'status_label'):
-            self.status_label.destroy()
-        
+            self.status_label.place_forget()
+
+    def show_printer_status(self, statuses):
+        # One line per printer, named after its device when there are several
+        lines = []
+        color = '#999999'
+        for status in statuses:
+            name = "Printer" if len(statuses) == 1 else os.path.basename(status['printer'])
+            if status['state'] == 'error':
+                lines.append(f"{name} error: " + ", ".join(status['errors']))
+                color = self.style['button_color']
+            elif status['state'] == 'offline':
+                lines.append(f"{name}: Offline")
+                color = self.style['button_color']
+            elif status['state'] == 'printing':
+                lines.append(f"{name}: Printing")
+            else:
+                lines.append(f"{name}: Ready")
+        self.printer_status_label.configure(text="\n".join(lines), fg=color, justify='right')
+
+    def show_spool(self, entries):
+        # Bottom center: how many labels wait for the printer or the operator
+        self.spool_entries = entries
+        waiting = sum(1 for entry in entries if entry['state'] != 'failed')
+        failed = len(entries) - waiting
+        if not entries:
+            self.spool_button.place_forget()
+        else:
+            parts = []
+            if waiting:
+                parts.append(f"{waiting} queued")
+            if failed:
+                parts.append(f"{failed} failed")
+            self.spool_button.configure(text=", ".join(parts))
+            self.spool_button.place(relx=0.5, rely=0.95, anchor='s')
+        if self.spool_popup is not None:
+            self.fill_spool_popup()
+
+    @ui_latency.timed('spool popup')
+    def show_spool_popup(self):
+        if self.spool_popup is not None:
+            self.spool_popup.lift()
+            return
+        self.spool_popup = tk.Toplevel(self)
+        self.spool_popup.title("Print queue")
+        self.spool_popup.geometry(f"500x300+{self.winfo_x() + 150}+{self.winfo_y() + 90}")
+        self.spool_popup.configure(bg='white')
+        self.spool_popup.protocol('WM_DELETE_WINDOW', self.close_spool_popup)
+        
+        self.spool_list = tk.Label(
+            self.spool_popup,
+            font=(self.style['font'], 12),
+            justify='left',
+            anchor='nw',
+            bg='white'
+        )
+        self.spool_list.pack(expand=True, fill='both', padx=15, pady=15)
+        
+        buttons = tk.Frame(self.spool_popup, bg='white')
+        buttons.pack(pady=(0, 10))
+        for text, command in (
+            ("RETRY", self.retry_spool),
+            ("DISCARD FAILED", self.discard_spool),
+            ("OK", self.close_spool_popup),
+        ):
+            tk.Button(
+                buttons,
+                text=text,
+                command=command,
+                font=(self.style['font'], 12),
+                bg=self.style['button_color'],
+                fg='white',
+                relief='flat',
+                padx=15,
+                pady=5
+            ).pack(side='left', padx=5)
+        self.fill_spool_popup()
+
+    def fill_spool_popup(self):
+        states = {'queued': "Printing", 'waiting': "Waiting for printer", 'failed': "Failed"}
+        lines = []
+        for entry in self.spool_entries:
+            line = f"{entry['name']} {entry['batch'] or ''} x{entry['copies']}: {states[entry['state']]}"
+            if entry['error'] and entry['state'] != 'queued':
+                line += f" ({entry['error']})"
+            lines.append(line)
+        self.spool_list.configure(text="\n".join(lines) or "No labels queued")
+
+    def close_spool_popup(self):
+        self.spool_popup.destroy()
+        self.spool_popup = None
+
+    @ui_latency.timed('retry spool')
+    def retry_spool(self):
+        self.winfo_toplevel().print_service.spool.retry()
+
+    @ui_latency.timed('discard spool')
+    def discard_spool(self):
+        self.winfo_toplevel().print_service.spool.discard()
+
+    @ui_latency.timed('batch list popup')
+    def show_bulk_popup(self):
+        if self.bulk_popup is not None:
+            self.bulk_popup.lift()
+            return
+        self.bulk_popup = tk.Toplevel(self)
+        self.bulk_popup.title("Batch list")
+        self.bulk_popup.geometry(f"500x300+{self.winfo_x() + 150}+{self.winfo_y() + 90}")
+        self.bulk_popup.configure(bg='white')
+        self.bulk_popup.protocol('WM_DELETE_WINDOW', self.close_bulk_popup)
+        self.bulk_content = None
+        
+        bulk = self.winfo_toplevel().print_service.bulk
+        if bulk is not None and not bulk.finished.is_set():
+            self.show_bulk_progress()
+        else:
+            self.show_batch_lists()
+
+    def bulk_frame(self):
+        # Fresh content for the popup
+        if self.bulk_content is not None:
+            self.bulk_content.destroy()
+        self.bulk_content = tk.Frame(self.bulk_popup, bg='white')
+        self.bulk_content.pack(expand=True, fill='both', padx=15, pady=15)
+        return self.bulk_content
+
+    def popup_button(self, parent, text, command):
+        button = tk.Button(
+            parent,
+            text=text,
+            command=command,
+            font=(self.style['font'], 12),
+            bg=self.style['button_color'],
+            fg='white',
+            relief='flat',
+            padx=15,
+            pady=5
+        )
+        button.pack(pady=5)
+        return button
+
+    def show_batch_lists(self):
+        from src.printing.bulk_print import find_batch_lists
+        frame = self.bulk_frame()
+        paths = find_batch_lists()
+        tk.Label(
+            frame,
+            text="Print a label for every batch in:" if paths else
+                 "No batch list found.\nPut a .csv or .txt file on a USB stick.",
+            font=(self.style['font'], 14),
+            bg='white'
+        ).pack(pady=(0, 10))
+        for path in paths[:5]:
+            self.popup_button(frame, os.path.basename(path), lambda path=path: self.start_bulk(path))
+        self.popup_button(frame, "CLOSE", self.close_bulk_popup)
+
+    @ui_latency.timed('start batch list')
+    def start_bulk(self, path):
+        try:
+            self.winfo_toplevel().print_service.bulk_print(path)
+        except (OSError, RuntimeError, ValueError) as e:
+            self.close_bulk_popup()
+            self.show_error(str(e))
+            return
+        self.show_bulk_progress()
+
+    def show_bulk_progress(self):
+        frame = self.bulk_frame()
+        self.bulk_status = tk.Label(
+            frame,
+            font=(self.style['font'], 18),
+            fg=self.style['button_color'],
+            bg='white'
+        )
+        self.bulk_status.pack(pady=(20, 20))
+        self.bulk_action = self.popup_button(frame, "CANCEL", self.cancel_bulk)
+        self.update_bulk_progress()
+
+    def update_bulk_progress(self):
+        if self.bulk_popup is None:
+            return
+        bulk = self.winfo_toplevel().print_service.bulk
+        printed, total = bulk.progress()
+        if total is None and not bulk.finished.is_set():
+            text = "Reading the batch list..."
+            if bulk.cancelled.is_set():
+                text += "\nStopping..."
+            self.bulk_status.configure(text=text)
+            self.after(250, self.update_bulk_progress)
+        elif total is None:
+            self.bulk_status.configure(text=f"Could not read the batch list\n{bulk.error}")
+            self.bulk_action.configure(text="OK", command=self.close_bulk_popup)
+        elif not bulk.finished.is_set():
+            text = f"Printing {printed} of {total}"
+            if bulk.cancelled.is_set():
+                text += "\nStopping..."
+            self.bulk_status.configure(text=text)
+            self.after(250, self.update_bulk_progress)
+        elif bulk.error is not None:
+            self.bulk_status.configure(text=f"Stopped after {printed} of {total}\n{bulk.error}")
+            self.bulk_action.configure(text="OK", command=self.close_bulk_popup)
+        else:
+            text = f"Printed {printed} of {total}"
+            if bulk.skipped:
+                text += f"\n{len(bulk.skipped)} rows skipped, not batch numbers"
+            self.bulk_status.configure(text=text)
+            self.bulk_action.configure(text="OK", command=self.close_bulk_popup)
+
+    @ui_latency.timed('cancel batch list')
+    def cancel_bulk(self):
+        self.winfo_toplevel().print_service.bulk.cancel()
+
+    def close_bulk_popup(self):
+        # Closing doesn't stop the printing, BATCH LIST shows it again
+        self.bulk_popup.destroy()
+        self.bulk_popup = None
+
+    def restore_button(self):
         # Reset input field
         self.batch_display.config(state='normal')
         self.batch_display.delete(0, tk.END)
@@ -270,179 +543,121 @@ class PrinterScreen(tk.Frame):
         # Ensure input field maintains focus
         self.batch_display.focus_set()
 
+    @ui_latency.timed('print')
     def print_receipt(self):
-        try:
-            # Create receipt image
-            receipt_image = self.create_receipt_image()
-            
-            # Save temporary image
-            temp_path = "temp_receipt.png"
-            receipt_image.save(temp_path)
-            
-            # Show printing feedback
-            self.show_printing_feedback()
-            
-            if self.winfo_toplevel().test_mode:
-                print("Test Mode: Labels would be printed")
-                print(f"Receipt preview saved as {temp_path}")
-            else:
-                # Real printing mode
-                # Printer settings
-                printer_model = 'QL-800'
-                
-                # Create the label instructions
-                qlr = BrotherQLRaster(printer_model)
-                qlr.exception_on_warning = True
-                
-                # Convert image to label format once
-                convert(
-                    qlr=qlr,
-                    images=[temp_path],
-                    label='62',  # 70mm endless label
-                    rotate='auto',
-                    threshold=70.0,
-                    dither=False,
-                    compress=False,
-                    red=False,
-                    dpi_600=False,
-                    hq=True,
-                    cut=True
-                )
-                
-                # Store instructions
-                instructions = qlr.data
-                
-                # Print the configured number of copies
-                num_copies = self.config_manager.get_num_copies()
-                for _ in range(num_copies):
-                    # Send to printer using linux_kernel backend
-                    send(
-                        instructions=instructions,
-                        printer_identifier='/dev/usb/lp0',
-                        backend_identifier='linux_kernel',
-                        blocking=True
-                    )
-                
-                # Clean up temporary file after printing
-                os.remove(temp_path)
-            
-        except Exception as e:
-            error_msg = str(e)
-            print(f"Error: {error_msg}")
-            
-            # Show error in GUI
-            error_popup = tk.Toplevel(self)
-            error_popup.title("Error")
-            
-            # Center the popup
-            error_popup.geometry("400x150")
-            error_popup.geometry(f"+{self.winfo_x() + 100}+{self.winfo_y() + 100}")
-            
-            # Add error message
-            if "Permission denied" in error_msg and "/dev/usb/lp0" in error_msg:
-                msg = "Printer permission denied.\nPlease run:\nsudo chmod 666 /dev/usb/lp0"
-            else:
-                msg = f"Error: {error_msg}"
-                
-            label = tk.Label(
-                error_popup,
-                text=msg,
-                pady=20,
-                font=(self.style['font'], 14),
-                fg=self.style['button_color']
-            )
-            label.pack()
-            
-            # Add OK button
-            ok_button = tk.Button(
-                error_popup,
-                text="OK",
-                command=error_popup.destroy,
-                font=(self.style['font'], 12),
-                bg=self.style['button_color'],
-                fg='white',
-                relief='flat',
-                padx=20,
-                pady=5
-            )
-            ok_button.pack(pady=10)
-            
-            # Restore the print button
-            self.restore_button()
-            
-    def create_easter_egg_image(self):
-        # Create a new image with white background - shorter height for single line
-        width = 800  # Width for 70mm tape
-        height = 150  # Shorter height for single line
-        image = Image.new('RGB', (width, height), 'white')
-        draw = ImageDraw.Draw(image)
-        
-        try:
-            font = ImageFont.truetype("assets/Nohemi/OpenType-TT/Nohemi-Bold.ttf", 48)
-        except:
-            font = ImageFont.load_default()
-        
-        message = "Slutt å tull!"
-        
-        # Center the text
-        text_width = font.getlength(message)
-        x = (width - text_width) / 2
-        y = (height - 48) / 2  # Vertically center based on font size
+        # START is taken now, so it matches the key press
+        job = self.labels.receipt(
+            self.batch_display.get(),
+            on_done=self.print_finished,
+            on_error=self.print_failed
+        )
+        self.winfo_toplevel().print_worker.submit(job)
         
-        # Draw the message
-        draw.text((x, y), message, font=font, fill='black')
+        # Show printing feedback and free the input for the next batch
+        self.show_printing_feedback()
+        self.restore_button()
+
+    @ui_latency.timed('scan')
+    def show_scan(self, batch, scanned_at):
+        # The scanner thread already queued the job, this only catches the
+        # screen up. The operator may be typing another batch on the
+        # numpad, so the input is only cleared when it holds this one.
+        self.scan_label.configure(text=f"Scanned {batch} at {scanned_at:%H:%M:%S}")
+        self.show_printing_feedback()
+        if self.batch_display.get() == batch:
+            self.restore_button()
+
+    @ui_latency.timed('reprint')
+    def reprint_label(self):
+        job = self.labels.reprint(
+            self.batch_display.get(),
+            on_done=self.print_finished,
+            on_error=self.print_failed
+        )
+        self.winfo_toplevel().print_worker.submit(job)
         
-        return image
-            
-    def print_easter_egg(self):
-        try:
-            # Create easter egg image
-            easter_egg_image = self.create_easter_egg_image()
-            
-            # Save temporary image
-            temp_path = "temp_easter_egg.png"
-            easter_egg_image.save(temp_path)
-            
-            # Show printing feedback
+        self.show_printing_feedback()
+        self.restore_button()
+
+    def print_finished(self):
+        if self.winfo_toplevel().print_worker.pending:
             self.show_printing_feedback()
+        else:
+            self.hide_printing_feedback()
+
+    def print_failed(self, error):
+        self.print_finished()
+        self.show_error(error)
+
+    def show_error(self, error):
+        print(f"Error: {error}")
+        
+        # Add error message. A spooled job's error wraps what the printer
+        # raised, the device path comes from whichever printer it was.
+        cause = getattr(error, 'error', error)
+        if isinstance(cause, PermissionError) and cause.filename:
+            msg = f"Printer permission denied.\nPlease run:\nsudo chmod 666 {cause.filename}"
+        else:
+            msg = f"Error: {error}"
+        
+        # One popup shows the latest error, so errors while nobody is at
+        # the station don't pile up windows
+        self.error_count += 1
+        if self.error_popup is not None:
+            if self.error_count > 1:
+                msg += f"\n({self.error_count} errors)"
+            self.error_label.configure(text=msg)
+            self.error_popup.lift()
+            return
             
-            if self.winfo_toplevel().test_mode:
-                print("Test Mode: Easter egg would be printed")
-                print(f"Easter egg preview saved as {temp_path}")
-            else:
-                # Real printing mode
-                # Printer settings
-                printer_model = 'QL-800'
-                
-                # Create the label instructions
-                qlr = BrotherQLRaster(printer_model)
-                qlr.exception_on_warning = True
-                
-                # Convert image to label format
-                convert(
-                    qlr=qlr,
-                    images=[temp_path],
-                    label='62',
-                    rotate='auto',
-                    threshold=70.0,
-                    dither=False,
-                    compress=False,
-                    red=False,
-                    dpi_600=False,
-                    hq=True,
-                    cut=True
-                )
-                
-                # Send to printer
-                send(
-                    instructions=qlr.data,
-                    printer_identifier='/dev/usb/lp0',
-                    backend_identifier='linux_kernel',
-                    blocking=True
-                )
-                
-                # Clean up
-                os.remove(temp_path)
+        # Show error in GUI
+        self.error_popup = tk.Toplevel(self)
+        self.error_popup.title("Error")
+        self.error_popup.protocol('WM_DELETE_WINDOW', self.close_error)
+        
+        # Center the popup
+        self.error_popup.geometry("400x150")
+        self.error_popup.geometry(f"+{self.winfo_x() + 100}+{self.winfo_y() + 100}")
+            
+        self.error_label = tk.Label(
+            self.error_popup,
+            text=msg,
+            pady=20,
+            font=(self.style['font'], 14),
+            fg=self.style['button_color']
+        )
+        self.error_label.pack()
+        
+        # Add OK button
+        ok_button = tk.Button(
+            self.error_popup,
+            text="OK",
+            command=self.close_error,
+            font=(self.style['font'], 12),
+            bg=self.style['button_color'],
+            fg='white',
+            relief='flat',
+            padx=20,
+            pady=5
+        )
+        ok_button.pack(pady=10)
+
+    def close_error(self):
+        self.error_popup.destroy()
+        self.error_popup = None
+        self.error_count = 0
             
-        except Exception as e:
-            print(f"Easter egg error: {str(e)}")
+    def print_easter_egg(self):
+        job = self.labels.easter_egg(
+            on_done=self.print_finished,
+            on_error=self.print_easter_egg_failed
+        )
+        self.winfo_toplevel().print_worker.submit(job)
+        
+        # Show printing feedback
+        self.show_printing_feedback()
+        self.restore_button()
+
+    def print_easter_egg_failed(self, error):
+        self.print_finished()
+        print(f"Easter egg error: {str(error)}")
@@ -1,5 +1,9 @@
 import tkinter as tk
+import time
+from collections import deque
 from tkinter import ttk, messagebox
+from src.profiling import PROFILE_JOBS, profiler
+from src.ui_latency import ui_latency
 
 class SettingsScreen(tk.Frame):
     def __init__(self, parent, config_manager, on_back):
@@ -15,6 +19,10 @@ class SettingsScreen(tk.Frame):
             'font': 'Nohemi-Bold'
         }
         
+        # Five taps on the title within 3 seconds open the profiling tools
+        self.title_taps = deque(maxlen=5)
+        self.profile_popup = None
+        
         self.setup_ui()
         
     def setup_ui(self):
@@ -27,6 +35,7 @@ class SettingsScreen(tk.Frame):
             fg=self.style['button_color']
         )
         title.pack(pady=20)
+        title.bind('<Button-1>', lambda e: self.title_tapped())
         
         # Settings container
         settings_frame = tk.Frame(self, bg=self.style['bg'])
@@ -165,7 +174,18 @@ class SettingsScreen(tk.Frame):
             pady=15
         )
         back_button.pack(pady=20)
+        
+        # Touchscreen responsiveness, see ui_latency.py
+        self.latency_label = tk.Label(
+            self,
+            text="",
+            font=(self.style['font'], 12),
+            fg='#999999',
+            bg=self.style['bg']
+        )
+        self.latency_label.place(relx=0.98, rely=0.97, anchor='se')
     
+    @ui_latency.timed('copies')
     def adjust_copies(self, delta):
         try:
             current = int(self.copies_var.get())
@@ -176,6 +196,7 @@ class SettingsScreen(tk.Frame):
             self.copies_var.set('1')
             self.config_manager.set_num_copies(1)
     
+    @ui_latency.timed('drying time')
     def adjust_drying(self, delta):
         try:
             current = int(self.drying_var.get())
@@ -183,10 +204,74 @@ class SettingsScreen(tk.Frame):
             self.drying_var.set(str(new_value))
             self.config_manager.set_drying_time(new_value)
         except ValueError:
-            self.drying_var.set('19')
-            self.config_manager.set_drying_time(19)
+            default = self.config_manager.get_default('printer', 'drying_time')
+            self.drying_var.set(str(default))
+            self.config_manager.set_drying_time(default)
+    
+    def refresh(self):
+        # Show the current values, config.yml may have been edited meanwhile
+        self.copies_var.set(str(self.config_manager.get_num_copies()))
+        self.drying_var.set(str(self.config_manager.get_drying_time()))
+        self.latency_label.configure(text=ui_latency.summary())
     
     def save_settings(self):
-        # Settings are saved immediately when adjusted
+        # Settings are saved in the background shortly after each change,
+        # write them now so nothing is pending
+        self.config_manager.flush()
         messagebox.showinfo("Success", "Settings saved successfully!")
         self.on_back()
+
+    def title_tapped(self):
+        now = time.monotonic()
+        self.title_taps.append(now)
+        if len(self.title_taps) == 5 and now - self.title_taps[0] <= 3:
+            self.title_taps.clear()
+            self.show_profile_popup()
+
+    def show_profile_popup(self):
+        # Hidden tools for when the station gets slow, see profiling.py
+        if self.profile_popup is not None:
+            self.profile_popup.lift()
+            return
+        self.profile_popup = tk.Toplevel(self)
+        self.profile_popup.title("Profiling")
+        self.profile_popup.geometry(f"500x340+{self.winfo_x() + 150}+{self.winfo_y() + 70}")
+        self.profile_popup.configure(bg='white')
+        self.profile_popup.protocol('WM_DELETE_WINDOW', self.close_profile_popup)
+        
+        self.profile_status = tk.Label(
+            self.profile_popup,
+            font=(self.style['font'], 12),
+            justify='left',
+            bg='white'
+        )
+        self.profile_status.pack(expand=True, fill='both', padx=15, pady=15)
+        
+        for text, command in (
+            (f"PROFILE NEXT {PROFILE_JOBS} PRINTS", profiler.profile_jobs),
+            ("MEMORY SNAPSHOT", profiler.memory_snapshot),
+            ("STOP MEMORY TRACING", profiler.stop_memory),
+            ("IMPORT TIMES", profiler.import_times),
+            ("CLOSE", self.close_profile_popup),
+        ):
+            tk.Button(
+                self.profile_popup,
+                text=text,
+                command=command,
+                font=(self.style['font'], 12),
+                bg=self.style['button_color'],
+                fg='white',
+                relief='flat',
+                pady=5
+            ).pack(fill='x', padx=15, pady=(0, 5))
+        self.update_profile_status()
+
+    def update_profile_status(self):
+        if self.profile_popup is None:
+            return
+        self.profile_status.configure(text=profiler.status())
+        self.after(1000, self.update_profile_status)
+
+    def close_profile_popup(self):
+        self.profile_popup.destroy()
+        self.profile_popup = None
@@ -0,0 +1,197 @@
+import gc
+import os
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+SOAK_LOG = 'soak.log'
+
+# A month of shifts at one station: 3 shifts a day, 22 working days
+PRINTS_PER_SHIFT = 300
+SOAK_PRINTS = PRINTS_PER_SHIFT * 3 * 22
+# Memory is compared against a baseline taken once this share of the
+# prints is done, when the caches, journal and histograms have filled up
+WARMUP_FRACTION = 0.1
+SAMPLES = 50
+# Growth allowed from the baseline to the end
+MAX_RSS_GROWTH = 16 * 1024 * 1024
+MAX_TRACED_GROWTH = 4 * 1024 * 1024
+MAX_WIDGET_GROWTH = 0
+# Jobs queued before the driver waits for the printer to catch up
+MAX_PENDING = 4
+# Every so often something goes wrong or the operator uses the other screens
+ERROR_EVERY = 97
+REPRINT_EVERY = 53
+EASTER_EGG_EVERY = 1009
+
+
+def rss_bytes():
+    # Resident set size, from /proc so psutil isn't needed
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def count_widgets(widget):
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+class SoakTest:
+    # Drives simulated prints and key presses through the real screens on
+    # the Tk loop, one action per after() tick, and samples RSS, the
+    # number of Tk widgets and tracemalloc. Fails when anything keeps
+    # growing after the warm-up.
+    def __init__(self, app, prints=SOAK_PRINTS, log_path=SOAK_LOG, seed=1):
+        self.app = app
+        self.screen = app.screens['printer']
+        self.prints = prints
+        self.log_path = log_path
+        self.random = random.Random(seed)
+        self.printed = 0
+        self.key_presses = 0
+        self.errors = 0
+        self.actions = iter(())
+        self.sample_every = max(1, prints // SAMPLES)
+        self.warmup = max(1, int(prints * WARMUP_FRACTION))
+        self.baseline = None
+        self.baseline_snapshot = None
+        self.started = None
+        self.passed = None
+
+    def start(self):
+        tracemalloc.start()
+        self.started = time.monotonic()
+        self.log(f"Soak test: {self.prints} prints")
+        # After the app's own on_interactive()
+        self.app.after_idle(self.step)
+
+    def log(self, line):
+        print(line)
+        with open(self.log_path, 'a') as f:
+            f.write(f"{datetime.now().isoformat(timespec='seconds')} {line}\n")
+
+    def step(self):
+        if self.app.print_worker.pending > MAX_PENDING:
+            # Let the printer catch up, like an operator waiting for labels
+            self.app.after(10, self.step)
+            return
+        action = next(self.actions, None)
+        if action is None:
+            if self.printed >= self.prints:
+                self.finish()
+                return
+            self.actions = self.print_cycle()
+            action = next(self.actions)
+        action()
+        self.app.after(0, self.step)
+
+    def press(self, key):
+        self.key_presses += 1
+        self.screen.numpad_press(key)
+
+    def print_cycle(self):
+        # The actions for one label: typing the batch, with the odd typo,
+        # printing it, and now and then something else
+        n = self.printed + 1
+        batch = str(self.random.randrange(10 ** 3, 10 ** self.random.randint(4, 10)))
+        for key in batch:
+            yield lambda key=key: self.press(key)
+            if self.random.random() < 0.02:
+                yield lambda: self.press('7')
+                yield lambda: self.press('⌫')
+        if n % EASTER_EGG_EVERY == 0:
+            yield lambda: self.press('C')
+            for key in '000':
+                yield lambda key=key: self.press(key)
+            # Backspace takes a 0 off, so it is typed again every time
+            for _ in range(5):
+                yield lambda: self.press('⌫')
+                yield lambda: self.press('0')
+            yield lambda: self.press('C')
+        elif n % REPRINT_EVERY == 0:
+            yield self.screen.reprint_label
+        else:
+            yield self.screen.print_receipt
+        if n % ERROR_EVERY == 0:
+            yield self.error
+            if self.random.random() < 0.3:
+                # Acknowledged, otherwise the next error lands in the same popup
+                yield self.screen.close_error
+        if n % PRINTS_PER_SHIFT == 0:
+            yield self.shift_change
+        yield lambda: self.printed_one(n)
+
+    def error(self):
+        self.errors += 1
+        self.screen.print_failed(RuntimeError("Soak test: printer error"))
+
+    def shift_change(self):
+        # New shift checks the settings and the print queue
+        settings = self.app.screens['settings']
+        self.app.show_settings_screen()
+        settings.adjust_copies(1)
+        settings.adjust_copies(-1)
+        self.app.show_printer_screen()
+        self.screen.show_spool_popup()
+        self.screen.close_spool_popup()
+
+    def printed_one(self, n):
+        self.printed = n
+        if n == self.warmup:
+            self.settle()
+            self.baseline = self.sample()
+            self.baseline_snapshot = tracemalloc.take_snapshot()
+        elif n % self.sample_every == 0:
+            self.sample()
+
+    def settle(self):
+        # Wait for queued jobs so they aren't counted as growth, and
+        # acknowledge the error popup like the operator would
+        while self.app.print_worker.pending:
+            self.app.update()
+            time.sleep(0.01)
+        if self.screen.error_popup is not None:
+            self.screen.close_error()
+        gc.collect()
+
+    def sample(self):
+        sample = {
+            'rss': rss_bytes(),
+            'traced': tracemalloc.get_traced_memory()[0],
+            'widgets': count_widgets(self.app),
+            'objects': len(gc.get_objects()),
+        }
+        rate = self.printed / (time.monotonic() - self.started)
+        self.log(
+            f"prints={self.printed} keys={self.key_presses} errors={self.errors} "
+            f"rss={sample['rss'] / 1024 / 1024:.1f}MB traced={sample['traced'] / 1024 / 1024:.1f}MB "
+            f"widgets={sample['widgets']} objects={sample['objects']} ({rate:.0f} prints/s)"
+        )
+        return sample
+
+    def finish(self):
+        self.settle()
+        final = self.sample()
+        failures = []
+        if self.baseline is not None:
+            for name, limit in (
+                ('rss', MAX_RSS_GROWTH),
+                ('traced', MAX_TRACED_GROWTH),
+                ('widgets', MAX_WIDGET_GROWTH),
+            ):
+                growth = final[name] - self.baseline[name]
+                if growth > limit:
+                    failures.append(f"{name} grew by {growth} (limit {limit})")
+
+            self.log("Top allocations since the baseline:")
+            stats = tracemalloc.take_snapshot().compare_to(self.baseline_snapshot, 'lineno')
+            for stat in stats[:10]:
+                self.log(f"  {stat}")
+        tracemalloc.stop()
+
+        self.passed = not failures
+        if self.passed:
+            self.log(f"Soak test passed: {self.printed} prints, {self.key_presses} key presses")
+        else:
+            self.log("Soak test FAILED: " + "; ".join(failures))
+        self.app.quit()
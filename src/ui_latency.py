@@ -0,0 +1,159 @@
+import functools
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+from src.printing.metrics import BUCKETS, metrics
+
+UI_LATENCY_PATH = 'ui_latency.log'
+MAX_BYTES = 1024 * 1024
+BACKUP_COUNT = 2
+
+# The heartbeat is scheduled this often with after()
+HEARTBEAT_MS = 20
+# A heartbeat this late, or a callback this slow, is logged with a stack
+STALL_THRESHOLD = 0.2
+# How often the watchdog thread checks on the heartbeat
+WATCHDOG_INTERVAL = 0.05
+# A summary line goes into the log this often
+SUMMARY_INTERVAL = 600
+
+
+def quantile(histogram, q):
+    # Upper bound of the bucket holding the q-quantile, None past the last
+    buckets, total, count = histogram
+    for bound, bucket in zip(BUCKETS, buckets):
+        if bucket >= q * count:
+            return bound
+    return None
+
+
+def format_bound(bound):
+    if bound is None:
+        return f"> {BUCKETS[-1]:g} s"
+    return f"≤ {bound * 1000:g} ms"
+
+
+class UiLatency:
+    # Measures how responsive the touchscreen is. A heartbeat scheduled with
+    # after() records how late it fires, touchscreen callbacks are timed
+    # with @ui_latency.timed(), and a watchdog thread samples the Tk
+    # thread's stack while it is blocked, so a stall can be traced to the
+    # code that caused it. Histograms go to the shared metrics.
+    def __init__(self):
+        self.app = None
+        self.tk_thread = None
+        self.log = None
+        self.stopped = threading.Event()
+        # When the last heartbeat ran and when the next one is due
+        self.last_beat = None
+        self.next_beat = None
+        # Callback running on the Tk thread, for the stall log
+        self.current = None
+        # Stack sampled by the watchdog during the stall after `sampled_beat`
+        self.stack = None
+        self.sampled_beat = None
+        # Stall after this heartbeat is already logged by a callback
+        self.logged_beat = None
+        self.stalls = 0
+        self.worst = 0.0
+
+    def start(self, app, log_path=UI_LATENCY_PATH):
+        # Call on the Tk thread once the window is up
+        self.app = app
+        self.tk_thread = threading.get_ident()
+        if log_path is not None:
+            self.open_log(log_path)
+        self.last_beat = time.monotonic()
+        self.next_beat = self.last_beat + HEARTBEAT_MS / 1000
+        app.after(HEARTBEAT_MS, self.beat)
+        threading.Thread(target=self.watch, name='ui-watchdog', daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def open_log(self, path):
+        import logging
+        from logging.handlers import RotatingFileHandler
+        handler = RotatingFileHandler(path, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        log = logging.getLogger('ui_latency')
+        log.setLevel(logging.INFO)
+        log.propagate = False
+        log.addHandler(handler)
+        self.log = log
+
+    def beat(self):
+        if self.stopped.is_set():
+            return
+        now = time.monotonic()
+        lateness = max(0.0, now - self.next_beat)
+        metrics.observe('ui_heartbeat_lateness_seconds', lateness)
+        self.worst = max(self.worst, lateness)
+        if lateness > STALL_THRESHOLD and self.logged_beat != self.last_beat:
+            self.stalled('event loop', lateness)
+        self.last_beat = now
+        self.next_beat = now + HEARTBEAT_MS / 1000
+        self.app.after(HEARTBEAT_MS, self.beat)
+
+    def timed(self, name):
+        # Decorator for Tk callbacks
+        def decorate(callback):
+            @functools.wraps(callback)
+            def timed_callback(*args, **kwargs):
+                outer = self.current
+                self.current = name
+                started = time.perf_counter()
+                try:
+                    return callback(*args, **kwargs)
+                finally:
+                    elapsed = time.perf_counter() - started
+                    self.current = outer
+                    metrics.observe('ui_callback_seconds', elapsed, callback=name)
+                    if elapsed > STALL_THRESHOLD:
+                        self.stalled(name, elapsed)
+                        self.logged_beat = self.last_beat
+            return timed_callback
+        return decorate
+
+    def stalled(self, name, seconds):
+        self.stalls += 1
+        metrics.count('ui_stalls_total', source=name)
+        stack = self.stack if self.sampled_beat == self.last_beat else None
+        where = f" in {self.current}" if self.current and self.current != name else ''
+        print(f"UI stalled {seconds * 1000:.0f} ms: {name}{where}")
+        if self.log is not None:
+            self.log.info(
+                f"{datetime.now().isoformat(timespec='milliseconds')} stall {seconds * 1000:.0f} ms: {name}{where}"
+                + (f"\n{stack}" if stack else '')
+            )
+
+    def watch(self):
+        last_summary = time.monotonic()
+        while not self.stopped.wait(WATCHDOG_INTERVAL):
+            now = time.monotonic()
+            last_beat = self.last_beat
+            # One sample per stall, taken while the Tk thread is still stuck
+            if now - last_beat > STALL_THRESHOLD and self.sampled_beat != last_beat:
+                frame = sys._current_frames().get(self.tk_thread)
+                if frame is not None:
+                    self.stack = ''.join(traceback.format_stack(frame)).rstrip()
+                    self.sampled_beat = last_beat
+            if self.log is not None and now - last_summary > SUMMARY_INTERVAL:
+                last_summary = now
+                self.log.info(f"{datetime.now().isoformat(timespec='seconds')} {self.summary()}")
+
+    def summary(self):
+        histogram = metrics.histogram('ui_heartbeat_lateness_seconds')
+        if histogram is None:
+            return "No UI latency measured yet"
+        return (
+            f"UI latency p50 {format_bound(quantile(histogram, 0.5))}, "
+            f"p99 {format_bound(quantile(histogram, 0.99))}, "
+            f"worst {self.worst * 1000:.0f} ms, {self.stalls} stalls"
+        )
+
+
+# Shared by the app and the screens
+ui_latency = UiLatency()
@@ -0,0 +1,56 @@
+from src.printing.bulk_print import count_batches, read_batches
+
+
+def write_list(tmp_path, text, name='batches.csv'):
+    path = tmp_path / name
+    path.write_bytes(text.encode('utf-8'))
+    return str(path)
+
+
+def test_plain_list(tmp_path):
+    path = write_list(tmp_path, "123456\n234567\n\n345678\n", 'batches.txt')
+    assert list(read_batches(path)) == ['123456', '234567', '345678']
+
+
+def test_header_and_columns(tmp_path):
+    path = write_list(tmp_path, "Batch,Qty,Note\n123456,4,first\n234567,2,\n")
+    assert list(read_batches(path)) == ['123456', '234567']
+
+
+def test_semicolons_from_excel(tmp_path):
+    # Excel set to Norwegian, with a byte order mark and CRLF
+    path = write_list(tmp_path, "\ufeffBatch;Antall\r\n123456;4\r\n234567;2\r\n")
+    assert list(read_batches(path)) == ['123456', '234567']
+
+
+def test_first_filled_in_column(tmp_path):
+    path = write_list(tmp_path, ";123456;4\n\t\t234567\n")
+    assert list(read_batches(path)) == ['123456', '234567']
+
+
+def test_mixed_separators(tmp_path):
+    # Too mixed for the sniffer, every separator splits
+    path = write_list(tmp_path, "123456\n234567;2\n345678,1\n456789\t3\n567890\n")
+    assert list(read_batches(path)) == ['123456', '234567', '345678', '456789', '567890']
+
+
+def test_skipped_rows(tmp_path):
+    path = write_list(tmp_path, "Batch\n123456\n12345678901\n234567\nnotes, no digits\n")
+    skipped = []
+    assert list(read_batches(path, skipped)) == ['123456', '234567']
+    # Headers and notes aren't batches at all, only bad batches are counted
+    assert skipped == [(3, '12345678901')]
+
+
+def test_quoted_separator_is_skipped(tmp_path):
+    path = write_list(tmp_path, 'Batch,Qty\n"1234,56",1\n234567,2\n')
+    skipped = []
+    assert list(read_batches(path, skipped)) == ['234567']
+    assert skipped == [(2, '1234,56')]
+
+
+def test_count_matches_read(tmp_path):
+    path = write_list(tmp_path, "Batch;Qty\n123456;1\n99999999999;1\n234567;1\n")
+    skipped = []
+    assert count_batches(path, skipped) == 2
+    assert skipped == [(3, '99999999999')]
@@ -0,0 +1,107 @@
+import os
+from src.printing.print_spool import PrintSpool
+
+RECORD = {'batch': '123456', 'started_at': '2024-05-02 06:10', 'finished_at': '2024-05-23 06:10'}
+
+
+def open_spool(path, **kwargs):
+    spool = PrintSpool(str(path), **kwargs)
+    spool.start()
+    spool.loaded.wait(5)
+    return spool
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / 'spool.bin'
+    spool = open_spool(path)
+    first = spool.add('Receipt 123456', 2, b'\x67\x00\x5a' + bytes(90), 1, RECORD)
+    second = spool.add('Reprint 42', 1, b'raster', 7)
+    third = spool.add('Receipt 7', 1, b'printed', 3)
+    spool.failed(second, OSError("Media end"))
+    spool.done(third)
+    spool.stop()
+
+    spool = open_spool(path)
+    entries = {entry.id: entry for entry in spool.resume()}
+    spool.stop()
+    assert sorted(entries) == [first, second]
+    entry = entries[first]
+    assert (entry.name, entry.copies, entry.rows, entry.record) == ('Receipt 123456', 2, 1, RECORD)
+    assert entry.data == b'\x67\x00\x5a' + bytes(90)
+    assert entries[second].record is None
+    assert (entries[second].attempts, entries[second].error) == (1, "Media end")
+
+
+def test_replay_order_and_ids(tmp_path):
+    path = tmp_path / 'spool.bin'
+    spool = open_spool(path)
+    ids = [spool.add(f'Receipt {i}', 1, bytes([i]), 1) for i in range(5)]
+    spool.stop()
+
+    spool = open_spool(path)
+    assert [entry.id for entry in spool.resume()] == ids
+    # Queued labels aren't handed out twice
+    assert spool.resume() == []
+    # New labels don't reuse the ids of the ones left over
+    assert spool.add('Receipt 5', 1, b'', 1) > ids[-1]
+    spool.stop()
+
+
+def test_failed_labels_stay_failed(tmp_path):
+    path = tmp_path / 'spool.bin'
+    spool = open_spool(path, max_attempts=2)
+    id = spool.add('Receipt 1', 1, b'data', 1)
+    spool.failed(id, OSError("Cover open"))
+    spool.failed(id, OSError("Cover open"))
+    spool.stop()
+
+    spool = open_spool(path, max_attempts=2)
+    assert spool.resume() == []
+    assert [entry['state'] for entry in spool.snapshot()] == ['failed']
+    spool.stop()
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    path = tmp_path / 'spool.bin'
+    spool = open_spool(path)
+    kept = spool.add('Receipt 1', 1, b'kept', 1)
+    spool.stop()
+    intact = os.path.getsize(path)
+
+    # A crash in the middle of writing the next label
+    spool = open_spool(path)
+    spool.add('Receipt 2', 1, os.urandom(2000), 1)
+    spool.stop()
+    with open(path, 'r+b') as f:
+        f.truncate(intact + 20)
+
+    spool = open_spool(path)
+    assert [entry.id for entry in spool.resume()] == [kept]
+    spool.stop()
+    # Compacted on load, so the torn record is gone for good
+    assert os.path.getsize(path) == intact
+
+
+def test_corrupt_record_stops_replay(tmp_path):
+    path = tmp_path / 'spool.bin'
+    spool = open_spool(path)
+    first = spool.add('Receipt 1', 1, b'first', 1)
+    spool.add('Receipt 2', 1, b'second', 1)
+    spool.stop()
+    with open(path, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xff]))
+
+    spool = open_spool(path)
+    assert [entry.id for entry in spool.resume()] == [first]
+    spool.stop()
+
+
+def test_full_spool_refuses_labels(tmp_path):
+    spool = open_spool(tmp_path / 'spool.bin', max_entries=2)
+    assert spool.add('Receipt 1', 1, b'', 1) is not None
+    assert spool.add('Receipt 2', 1, b'', 1) is not None
+    assert spool.add('Receipt 3', 1, b'', 1) is None
+    spool.stop()
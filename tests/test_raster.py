@@ -0,0 +1,67 @@
+import random
+import pytest
+from PIL import Image, ImageDraw
+from brother_ql.conversion import convert
+from brother_ql.raster import BrotherQLRaster
+from src.printing.label_geometry import LABEL, LABEL_GEOMETRY, PRINTER_MODEL, TWO_COLOR_LABEL
+from src.printing.label_printer import (
+    THRESHOLD, build_raster_data, build_two_color_raster_data, compose_instructions
+)
+
+
+def random_label(label, mode, fill, rows=300, seed=1):
+    # Boxes in random shades, so dots on both sides of the threshold and
+    # the label's edges are all covered
+    rnd = random.Random(seed)
+    width = LABEL_GEOMETRY[label].width
+    image = Image.new(mode, (width, rows), 'white')
+    draw = ImageDraw.Draw(image)
+    for _ in range(200):
+        x, y = rnd.randrange(width), rnd.randrange(rows)
+        draw.rectangle([x, y, x + rnd.randrange(40), y + rnd.randrange(20)], fill=fill(rnd))
+    return image
+
+
+def brother_ql_instructions(image, label, red=False):
+    qlr = BrotherQLRaster(PRINTER_MODEL)
+    qlr.exception_on_warning = True
+    return convert(
+        qlr, [image], label, cut=True, dither=False, compress=False,
+        red=red, threshold=THRESHOLD, dpi_600=False, hq=True, rotate='0'
+    )
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_black_matches_brother_ql(seed):
+    image = random_label(LABEL, 'L', lambda rnd: rnd.randrange(256), seed=seed)
+    expected = brother_ql_instructions(image, LABEL)
+    assert compose_instructions(*build_raster_data(image)) == expected
+
+
+def test_blank_and_full_labels():
+    width = LABEL_GEOMETRY[LABEL].width
+    for shade in (0, 255):
+        image = Image.new('L', (width, 10), shade)
+        assert compose_instructions(*build_raster_data(image)) == brother_ql_instructions(image, LABEL)
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_two_color_matches_brother_ql(seed):
+    # Any colour, so pixels land in black, red and neither
+    image = random_label(
+        TWO_COLOR_LABEL, 'RGB', lambda rnd: tuple(rnd.randrange(256) for _ in range(3)), seed=seed
+    )
+    expected = brother_ql_instructions(image, TWO_COLOR_LABEL, red=True)
+    data, rows = build_two_color_raster_data(image)
+    assert compose_instructions(data, rows, label=TWO_COLOR_LABEL) == expected
+
+
+def test_pure_colors_match_brother_ql():
+    width = LABEL_GEOMETRY[TWO_COLOR_LABEL].width
+    image = Image.new('RGB', (width, 30), 'white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, width // 3, 29], fill='black')
+    draw.rectangle([width // 3, 0, 2 * width // 3, 29], fill='red')
+    expected = brother_ql_instructions(image, TWO_COLOR_LABEL, red=True)
+    data, rows = build_two_color_raster_data(image)
+    assert compose_instructions(data, rows, label=TWO_COLOR_LABEL) == expected